@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Bulk user provisioning
+Streams users from a CSV or NDJSON file into MongoDB using the same pipeline as
+POST /api/admin/users/import (validation, parallel hashing, unordered batched inserts)
+
+    python provision_users.py users.csv
+    python provision_users.py users.ndjson --format ndjson > report.json
+
+CSV files need a header row with username, email, full_name and password columns.
+Reads MONGO_URL and DB_NAME like the server does.
+"""
+
+import argparse
+import asyncio
+import sys
+
+import server
+
+
+async def read_lines(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Provision portal users from a CSV or NDJSON file")
+    parser.add_argument("path", help="Input file")
+    parser.add_argument("--format", choices=("csv", "ndjson"),
+                        help="Input format (default: guessed from the file extension)")
+    args = parser.parse_args()
+
+    input_format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+
+    server.connect_database()
+    try:
+        await server.ensure_indexes()
+        report = await server.provision_users(server.iter_user_rows(read_lines(args.path), input_format))
+    finally:
+        server.shutdown_bulk_executor()
+        server.client.close()
+
+    print(report.model_dump_json(indent=2))
+    print(f"{report.inserted}/{report.total} users inserted, {report.failed} failed", file=sys.stderr)
+    return 0 if report.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
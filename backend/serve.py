@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Multi-process entry point for the portal API
+
+    python serve.py
+
+Runs uvicorn with WEB_CONCURRENCY workers (default: one per CPU core). With more
+than one worker, SHARED_STATE_BACKEND defaults to "file" so that token
+revocations, user cache invalidations and login rate limits are shared between
+workers through a SQLite file on /dev/shm. Set SHARED_STATE_BACKEND=redis (and
+SHARED_STATE_REDIS_URL) to share them across hosts instead.
+
+The password pool is divided between workers unless PASSWORD_POOL_SIZE is set,
+so N workers do not each start one bcrypt thread per core.
+
+Workers accept connections before their startup warmup has finished; point load
+balancer or Kubernetes readiness probes at /health/ready and liveness at /health/live.
+"""
+
+import os
+from pathlib import Path
+
+import uvicorn
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    workers = int(os.environ.get("WEB_CONCURRENCY", cpus))
+    if workers > 1:
+        os.environ.setdefault("SHARED_STATE_BACKEND", "file")
+        os.environ.setdefault("PASSWORD_POOL_SIZE", str(max(1, cpus // workers)))
+
+    uvicorn.run(
+        "server:app",
+        app_dir=str(Path(__file__).parent),
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", 8001)),
+        workers=workers,
+        proxy_headers=True,
+        log_level=os.environ.get("LOG_LEVEL", "info"),
+    )
+
+
+if __name__ == "__main__":
+    main()
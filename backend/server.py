@@ -1,36 +1,869 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId, json_util
+from pymongo import monitoring
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, ExecutionTimeout, PyMongoError
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
+import base64
+import bisect
+import csv
+import gzip
+import hashlib
+import json
+import math
+import multiprocessing
 import os
+import random
+import re
 import logging
+import sys
+import tempfile
+import threading
+import time
+import traceback
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from state_backends import FileStateBackend, RateLimitBackend, RedisStateBackend, SharedStateBackend
 from typing import List, Optional
 import uuid
 from datetime import datetime, timedelta
 import jwt
 import bcrypt
 
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip is offered without it
+    brotli = None
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; the client is created by the app lifespan handler
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+MONGO_DB_NAME = os.environ['DB_NAME']
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 10))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 0)) or None
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 30000))
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+client = None
+db = None
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = 'HS256'
-JWT_EXPIRATION_HOURS = 24
+# Short-lived access tokens, renewed through rotating refresh tokens kept in the sessions collection
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get('ACCESS_TOKEN_EXPIRE_MINUTES', 15))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get('REFRESH_TOKEN_EXPIRE_DAYS', 30))
+# A just-rotated refresh token presented again within this window is rejected without
+# revoking the session (concurrent refreshes from two tabs); later reuse revokes it
+REFRESH_REUSE_GRACE_SECONDS = int(os.environ.get('REFRESH_REUSE_GRACE_SECONDS', 30))
+# Cache validated claims per token digest so repeat requests skip signature checks
+JWT_FAST_PATH = os.environ.get('JWT_FAST_PATH', 'false').lower() in ('1', 'true', 'yes')
+JWT_CLAIMS_CACHE_MAX_SIZE = int(os.environ.get('JWT_CLAIMS_CACHE_MAX_SIZE', 50000))
+
+# Per-application access tokens
+APP_TOKEN_SECRET = os.environ.get('APP_TOKEN_SECRET', JWT_SECRET)
+APP_TOKEN_TTL_SECONDS = int(os.environ.get('APP_TOKEN_TTL_SECONDS', 300))
+# An issued token is handed out again while it still has at least this much life left
+APP_TOKEN_REUSE_MIN_SECONDS = int(os.environ.get('APP_TOKEN_REUSE_MIN_SECONDS', 60))
+APP_TOKEN_CACHE_MAX_SIZE = int(os.environ.get('APP_TOKEN_CACHE_MAX_SIZE', 50000))
+APP_TOKEN_BATCH_MAX = int(os.environ.get('APP_TOKEN_BATCH_MAX', 100))
+
+# Password hashing pool configuration
+PASSWORD_POOL_KIND = os.environ.get('PASSWORD_POOL_KIND', 'thread')  # "thread" or "process"
+PASSWORD_POOL_SIZE = int(os.environ.get('PASSWORD_POOL_SIZE', os.cpu_count() or 1))
+PASSWORD_POOL_MAX_QUEUE = int(os.environ.get('PASSWORD_POOL_MAX_QUEUE', PASSWORD_POOL_SIZE * 4))
+
+# HTTP caching: responses are per-user, so only private caches may store them and must revalidate
+PRIVATE_CACHE_CONTROL = os.environ.get('PRIVATE_CACHE_CONTROL', 'private, no-cache')
+
+# Response compression
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get('COMPRESSION_MINIMUM_SIZE', 500))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+COMPRESSION_CACHE_MAX_SIZE = int(os.environ.get('COMPRESSION_CACHE_MAX_SIZE', 256))
+
+# Metrics configuration
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL_SECONDS', 0.5))
+
+# Event loop watchdog: log the stack of whatever holds the loop longer than the threshold
+LOOP_WATCHDOG_ENABLED = os.environ.get('LOOP_WATCHDOG_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+LOOP_WATCHDOG_THRESHOLD_MS = float(os.environ.get('LOOP_WATCHDOG_THRESHOLD_MS', 100))
+
+# Opt-in per-request sampling profiler, requested by admins with X-Profile: 1 or ?profile=1
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 1))
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', 30))
+
+# Password hashing policy: a fixed bcrypt cost, or one calibrated at startup to a latency target
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 0)) or None
+BCRYPT_TARGET_MS = float(os.environ.get('BCRYPT_TARGET_MS', 0)) or None
+BCRYPT_MIN_ROUNDS = int(os.environ.get('BCRYPT_MIN_ROUNDS', 10))
+BCRYPT_MAX_ROUNDS = int(os.environ.get('BCRYPT_MAX_ROUNDS', 15))
+BCRYPT_DEFAULT_ROUNDS = 12
+
+# Administrators, in addition to users flagged is_admin in the database
+ADMIN_USERNAMES = {name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()}
+
+# Bulk user provisioning
+BULK_IMPORT_BATCH_SIZE = int(os.environ.get('BULK_IMPORT_BATCH_SIZE', 1000))
+BULK_IMPORT_WORKERS = int(os.environ.get('BULK_IMPORT_WORKERS', os.cpu_count() or 1))
+BULK_IMPORT_MAX_ERRORS = int(os.environ.get('BULK_IMPORT_MAX_ERRORS', 1000))
+
+# Login rate limiting (token buckets per client IP and per username)
+LOGIN_RATE_LIMIT_ENABLED = os.environ.get('LOGIN_RATE_LIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+LOGIN_USER_BURST = float(os.environ.get('LOGIN_USER_BURST', 10))
+LOGIN_USER_REFILL_PER_MINUTE = float(os.environ.get('LOGIN_USER_REFILL_PER_MINUTE', 10))
+LOGIN_IP_BURST = float(os.environ.get('LOGIN_IP_BURST', 100))
+LOGIN_IP_REFILL_PER_MINUTE = float(os.environ.get('LOGIN_IP_REFILL_PER_MINUTE', 100))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+# Only enable behind a proxy that overwrites X-Forwarded-For, otherwise clients can spoof it
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() in ('1', 'true', 'yes')
+
+# State shared between worker processes: "local" (single process), "file" or "redis"
+SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', 'local')
+SHARED_STATE_PATH = os.environ.get(
+    'SHARED_STATE_PATH',
+    os.path.join(
+        '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+        f'portal-shared-state-{MONGO_DB_NAME}.sqlite',
+    ),
+)
+SHARED_STATE_POLL_SECONDS = float(os.environ.get('SHARED_STATE_POLL_SECONDS', 0.5))
+SHARED_STATE_REDIS_URL = os.environ.get('SHARED_STATE_REDIS_URL', 'redis://localhost:6379/0')
+# Both defaults are scoped to the database, so deployments sharing a host or a Redis
+# server do not apply each other's revocations and invalidations
+SHARED_STATE_KEY_PREFIX = os.environ.get('SHARED_STATE_KEY_PREFIX', f'portal:{MONGO_DB_NAME}:')
+
+# Authenticated user cache configuration
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', 10000))
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+
+# Mongo failure handling on the request path: per-operation deadline and circuit breaker
+DB_OPERATION_TIMEOUT_SECONDS = float(os.environ.get('DB_OPERATION_TIMEOUT_SECONDS', 2))
+DB_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('DB_BREAKER_FAILURE_THRESHOLD', 5))
+DB_BREAKER_RESET_SECONDS = float(os.environ.get('DB_BREAKER_RESET_SECONDS', 10))
+# How long last-known-good users and entitlements may be served while Mongo is unavailable
+STALE_CACHE_TTL_SECONDS = float(os.environ.get('STALE_CACHE_TTL_SECONDS', 3600))
+
+# Application catalog configuration
+CATALOG_REFRESH_SECONDS = float(os.environ.get('CATALOG_REFRESH_SECONDS', 5))
+
+# Application health probe configuration
+HEALTH_PROBE_ENABLED = os.environ.get('HEALTH_PROBE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+HEALTH_PROBE_INTERVAL_SECONDS = float(os.environ.get('HEALTH_PROBE_INTERVAL_SECONDS', 30))
+HEALTH_PROBE_JITTER = float(os.environ.get('HEALTH_PROBE_JITTER', 0.2))  # fraction of the interval
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_PROBE_TIMEOUT_SECONDS', 5))
+HEALTH_PROBE_CONCURRENCY = int(os.environ.get('HEALTH_PROBE_CONCURRENCY', 20))
+
+# Live event stream (server-sent events) configuration
+SSE_CLIENT_QUEUE_SIZE = int(os.environ.get('SSE_CLIENT_QUEUE_SIZE', 64))
+SSE_MAX_CLIENTS = int(os.environ.get('SSE_MAX_CLIENTS', 10000))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+SSE_TICKET_TTL_SECONDS = int(os.environ.get('SSE_TICKET_TTL_SECONDS', 30))
+# Streams are closed after this long so clients reconnect with a fresh ticket
+SSE_MAX_STREAM_SECONDS = float(os.environ.get('SSE_MAX_STREAM_SECONDS', ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+
+# Audit trail configuration
+AUDIT_ENABLED = os.environ.get('AUDIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.environ.get('AUDIT_FLUSH_INTERVAL_SECONDS', 1))
+AUDIT_WRITE_TIMEOUT_SECONDS = float(os.environ.get('AUDIT_WRITE_TIMEOUT_SECONDS', 2))
+# Size of the capped audit_events collection; 0 leaves it uncapped (for example to manage retention with a TTL index)
+AUDIT_COLLECTION_SIZE_BYTES = int(os.environ.get('AUDIT_COLLECTION_SIZE_BYTES', 1024 ** 3))
+AUDIT_SPILL_DIR = os.environ.get('AUDIT_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'portal-audit'))
+
+# Startup configuration
+# Requests that arrive before warmup has finished wait up to this long, then get a 503
+READINESS_WAIT_SECONDS = float(os.environ.get('READINESS_WAIT_SECONDS', 30))
+WARMUP_RETRY_SECONDS = float(os.environ.get('WARMUP_RETRY_SECONDS', 5))
+
+# Entitlement configuration; every user is implicitly a member of ALL_USERS_GROUP
+ALL_USERS_GROUP = os.environ.get('ALL_USERS_GROUP', 'all-users')
+ENTITLEMENT_CACHE_MAX_SIZE = int(os.environ.get('ENTITLEMENT_CACHE_MAX_SIZE', 10000))
+ENTITLEMENT_CACHE_TTL_SECONDS = float(os.environ.get('ENTITLEMENT_CACHE_TTL_SECONDS', 300))
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+# httpx logs every health probe at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+# Metrics are updated from Motor's executor threads (CommandTimer) and the loop watchdog
+# as well as the event loop, so every update and scrape snapshot holds the metric's lock.
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+class Gauge:
+    """Gauge whose value is either set directly or read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        if self.callback is not None:
+            values = list(self.callback().items())
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        bucket_names = self.labelnames + ("le",)
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(bucket_names, labels + (bound,))} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            yield f"{self.name}_bucket{_format_labels(bucket_names, labels + ('+Inf',))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+http_requests_total = metrics.register(Counter(
+    "portal_http_requests_total", "HTTP requests handled", ("method", "route", "status")))
+http_request_duration = metrics.register(Histogram(
+    "portal_http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+mongo_command_duration = metrics.register(Histogram(
+    "portal_mongo_command_duration_seconds", "MongoDB command latency", ("command",)))
+mongo_command_failures_total = metrics.register(Counter(
+    "portal_mongo_command_failures_total", "Failed MongoDB commands", ("command",)))
+password_hash_duration = metrics.register(Histogram(
+    "portal_password_hash_seconds", "Time spent inside bcrypt", ("operation",)))
+password_pool_wait_duration = metrics.register(Histogram(
+    "portal_password_pool_wait_seconds", "Time password jobs waited for a pool worker", ("operation",)))
+login_rate_limited_total = metrics.register(Counter(
+    "portal_login_rate_limited_total", "Login attempts rejected by the rate limiter", ("scope",)))
+password_rehash_total = metrics.register(Counter(
+    "portal_password_rehash_total", "Password hash upgrades after login", ("result",)))
+audit_events_total = metrics.register(Counter(
+    "portal_audit_events_total", "Audit events by outcome", ("outcome",)))
+health_probe_duration = metrics.register(Histogram(
+    "portal_health_probe_seconds", "Application health probe latency", ("status",)))
+event_loop_lag = metrics.register(Histogram(
+    "portal_event_loop_lag_seconds", "Delay between scheduled and actual event loop wake-ups"))
+stale_fallback_total = metrics.register(Counter(
+    "portal_stale_fallback_total", "Last-known-good cache lookups while Mongo was unavailable", ("cache", "result")))
+event_loop_stalls_total = metrics.register(Counter(
+    "portal_event_loop_stalls_total", "Times the loop watchdog caught a callback blocking the event loop"))
+
+class CommandTimer(monitoring.CommandListener):
+    """Feeds the duration of every MongoDB command into the metrics registry."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event):
+        mongo_command_duration.observe(event.duration_micros / 1e6, event.command_name)
+        mongo_command_failures_total.inc(event.command_name)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts and latency per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], path)
+            http_requests_total.inc(scope["method"], path, status_code)
+
+class CompressionMiddleware:
+    """Compresses complete responses with brotli or gzip, whichever the client accepts.
+
+    Streaming responses pass through untouched. Compressed bodies of responses that
+    carry an ETag are cached, so revalidated catalog and profile downloads are not
+    compressed again.
+    """
+
+    def __init__(self, app, minimum_size: int, gzip_level: int, brotli_quality: int, cache_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = TTLCache(cache_size, 3600)
+
+    @staticmethod
+    def negotiate(accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for part in accept_encoding.split(","):
+            coding, *params = [item.strip() for item in part.split(";")]
+            quality = 1.0
+            for param in params:
+                name, _, value = param.partition("=")
+                if name.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if quality > 0:
+                accepted.add(coding.lower())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self.negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            pending_start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=pending_start["headers"])
+            if (
+                message.get("more_body")
+                or len(body) < self.minimum_size
+                or pending_start["status"] != 200
+                or "content-encoding" in headers
+            ):
+                await send(pending_start)
+                await send(message)
+                return
+
+            etag = headers.get("etag")
+            compressed = self.cache.get((etag, encoding)) if etag else None
+            if compressed is None:
+                compressed = self.compress(body, encoding)
+                if etag:
+                    self.cache.set((etag, encoding), compressed)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(pending_start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+async def monitor_event_loop_lag():
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        event_loop_lag.observe(max(time.perf_counter() - started - EVENT_LOOP_LAG_INTERVAL_SECONDS, 0.0))
+
+class EventLoopWatchdog:
+    """Logs the stack of whatever holds the event loop longer than a threshold.
+
+    A task on the loop stamps a heartbeat several times per threshold; a daemon thread
+    checks the stamp and, once it is older than the threshold, captures the loop
+    thread's current frame. Blocked code cannot yield, so that frame is the culprit
+    (bcrypt, jwt, a large Pydantic build...). Each stall is reported once.
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.stalls = 0
+        self._beat = 0.0
+        self._reported_beat = None
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.threshold / 4)
+
+    def _watch(self):
+        while not self._stopping.wait(self.threshold / 4):
+            beat = self._beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold or beat == self._reported_beat:
+                continue
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "  <unavailable>\n"
+            self.stalls += 1
+            event_loop_stalls_total.inc()
+            logger.warning("Event loop blocked for %.0f ms so far, in:\n%s", blocked * 1000, stack)
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+loop_watchdog = EventLoopWatchdog(LOOP_WATCHDOG_THRESHOLD_MS / 1000)
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval into collapsed-stack counts.
+
+    The output is the "frame;frame;frame count" format read by flamegraph.pl,
+    speedscope and inferno. Samples cover everything the thread ran while the
+    sampler was on, including other requests sharing the event loop.
+    """
+
+    def __init__(self, thread_id: int, interval: float, max_seconds: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.counts = {}
+        self.samples = 0
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stopping.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = self._collapse(frame)
+            self.counts[stack] = self.counts.get(stack, 0) + 1
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.counts.items()))
+
+class ProfilingMiddleware:
+    """Returns a sampling profile instead of the response when an admin asks for one.
+
+    Send X-Profile: 1 or ?profile=1 with an admin bearer token; the request runs
+    normally while the event loop thread is sampled, then the body is replaced by
+    collapsed stacks (text/plain). The original status is kept in X-Profile-Status.
+    A request too quick to be sampled gets its original response back, marked with
+    X-Profile-Samples: 0. Anyone else's flag is ignored.
+    """
+
+    def __init__(self, app, interval: float, max_seconds: float):
+        self.app = app
+        self.interval = interval
+        self.max_seconds = max_seconds
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        if Headers(scope=scope).get("x-profile", "").lower() in ("1", "true"):
+            return True
+        query = scope.get("query_string", b"").decode("latin-1")
+        return any(part in ("profile=1", "profile=true") for part in query.split("&"))
+
+    @staticmethod
+    async def _is_admin_request(scope) -> bool:
+        scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        try:
+            claims = decode_access_token(token)
+        except jwt.PyJWTError:
+            return False
+        if "sub" not in claims or revocations.is_revoked(claims):
+            return False
+        try:
+            user = await load_user(claims["sub"])
+        except DatabaseUnavailable:
+            return False
+        return user is not None and user.is_active and is_admin(user)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope) or not await self._is_admin_request(scope):
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        messages = []
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            messages.append(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval, self.max_seconds)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+        if not sampler.samples:
+            for message in messages:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message)["X-Profile-Samples"] = "0"
+                await send(message)
+            return
+        body = sampler.collapsed().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"cache-control", b"no-store"),
+                (b"x-profile-status", str(status_code).encode()),
+                (b"x-profile-samples", str(sampler.samples).encode()),
+                (b"x-profile-duration-ms", f"{(time.perf_counter() - started) * 1000:.1f}".encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+class PoolCheckoutMonitor(monitoring.ConnectionPoolListener):
+    """Measures how long operations wait to check a connection out of the Motor pool."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.failures = 0
+        self.connections_created = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _record_wait(self, failed: bool):
+        started = getattr(self._local, "started", None)
+        waited = time.perf_counter() - started if started is not None else 0.0
+        with self._lock:
+            if failed:
+                self.failures += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        self._record_wait(failed=False)
+
+    def connection_check_out_failed(self, event):
+        self._record_wait(failed=True)
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+    def stats(self) -> dict:
+        attempts = self.checkouts + self.failures
+        return {
+            "checkouts": self.checkouts,
+            "failures": self.failures,
+            "connections_created": self.connections_created,
+            "wait_seconds_avg": self.wait_seconds_total / attempts if attempts else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+pool_monitor = PoolCheckoutMonitor()
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        mongo_url,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        readPreference=MONGO_READ_PREFERENCE,
+        event_listeners=[pool_monitor, CommandTimer()],
+    )
+
+def connect_database():
+    global client, db
+    client = create_mongo_client()
+    db = client[MONGO_DB_NAME]
+
+class StartupWarmup:
+    """Startup work that runs after the server is already listening.
+
+    Creating the Mongo client is cheap and does no I/O, so the process comes up
+    immediately. Opening connections, bcrypt calibration, index and seed bootstrap,
+    and loading the catalog happen here, and are retried until they succeed.
+    /health/ready reports the outcome with per-step timings and the build result of
+    every index. API requests that arrive early wait for it through ``wait_until_ready``.
+    """
+
+    def __init__(self):
+        self.task = None
+        self.steps = {}
+        self.error = None
+        self.ready_seconds = None
+        # Set once bootstrap_database has run, for background writers that must not create collections first
+        self.bootstrapped = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    async def _step(self, name: str, coro):
+        started = time.perf_counter()
+        await coro
+        self.steps[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    async def _run(self):
+        started = time.perf_counter()
+        while True:
+            try:
+                # Opens the first connection; minPoolSize fills the rest in the background
+                await self._step("mongo_ping", client.admin.command("ping"))
+                await asyncio.gather(
+                    self._step("bcrypt_calibration", hashing_policy.calibrate()),
+                    self._step("bootstrap_database", self._bootstrap()),
+                )
+                await self._step("entitlements", entitlement_index.warm())
+                break
+            except Exception as e:
+                self.error = str(e)
+                logger.exception("Startup warmup failed, retrying in %.0f s", WARMUP_RETRY_SECONDS)
+                await asyncio.sleep(WARMUP_RETRY_SECONDS)
+        application_catalog.start()
+        if HEALTH_PROBE_ENABLED:
+            health_prober.start()
+        self.error = None
+        self.ready_seconds = round(time.perf_counter() - started, 3)
+        logger.info("Ready after %.0f ms of warmup: %s", self.ready_seconds * 1000, self.steps)
+
+    async def _bootstrap(self):
+        await bootstrap_database()
+        self.bootstrapped.set()
+
+    def start(self):
+        if self.task is None:
+            self.steps, self.error, self.ready_seconds = {}, None, None
+            self.bootstrapped = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    async def wait(self, timeout: float):
+        await asyncio.wait_for(asyncio.shield(self.task), timeout)
+
+    async def stop(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task = None
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "ready_seconds": self.ready_seconds,
+            "steps_ms": self.steps,
+            "error": self.error,
+            "indexes": index_status,
+        }
+
+startup = StartupWarmup()
+
+async def wait_until_ready():
+    if startup.ready:
+        return
+    try:
+        await startup.wait(READINESS_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Service is starting",
+            headers={"Retry-After": "5"},
+        )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect_database()
+    await shared_state.start()
+    startup.start()
+    if AUDIT_ENABLED:
+        audit_log.start(startup.bootstrapped)
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag())
+    if LOOP_WATCHDOG_ENABLED:
+        loop_watchdog.start()
+    yield
+    loop_watchdog.stop()
+    lag_monitor.cancel()
+    await startup.stop()
+    await health_prober.stop()
+    await application_catalog.stop()
+    await audit_log.stop()
+    client.close()
+    password_pool.shutdown()
+    shutdown_bulk_executor()
+    await shared_state.stop()
 
 # Create the main app without a prefix
-app = FastAPI(title="SyncLogic Portal API")
+app = FastAPI(
+    title="SyncLogic Portal API",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
+)
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", dependencies=[Depends(wait_until_ready)])
 
 # Security
 security = HTTPBearer()
@@ -43,7 +876,10 @@ class User(BaseModel):
     full_name: str
     hashed_password: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = None
     is_active: bool = True
+    is_admin: bool = False
+    groups: List[str] = []
 
 class UserCreate(BaseModel):
     username: str
@@ -62,10 +898,31 @@ class UserResponse(BaseModel):
     full_name: str
     is_active: bool
 
+class UserUpdate(BaseModel):
+    email: Optional[str] = None
+    full_name: Optional[str] = None
+    is_active: Optional[bool] = None
+
+class BulkImportError(BaseModel):
+    row: int
+    username: Optional[str] = None
+    error: str
+
+class BulkImportReport(BaseModel):
+    total: int = 0
+    inserted: int = 0
+    failed: int = 0
+    errors: List[BulkImportError] = []
+
 class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class Application(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -76,23 +933,1525 @@ class Application(BaseModel):
     url: Optional[str] = None
     is_active: bool = True
 
+class ApplicationInput(BaseModel):
+    name: str
+    description: str
+    icon: str
+    category: str
+    url: Optional[str] = None
+    is_active: bool = True
+
+class ApplicationWithStatus(Application):
+    status: str = "unknown"  # "up", "down" or "unknown"
+
+class EventTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
+class AppAccessToken(BaseModel):
+    access_token: str
+    app_id: str
+    expires_in: int
+
+class AppAccessTokenBatchRequest(BaseModel):
+    app_ids: List[str]
+
+class AppAccessTokenBatch(BaseModel):
+    tokens: List[AppAccessToken]
+    unknown_app_ids: List[str]
+
+# Seed catalog, inserted into the applications collection when it is empty
+DEFAULT_APPLICATIONS = [
+    # Native secure applications
+    {
+        "id": "app1",
+        "name": "WordPress",
+        "description": "Plateforme de gestion de contenu",
+        "icon": "🌐",
+        "category": "native",
+        "url": "https://wordpress.example.com",
+    },
+    {
+        "id": "app2",
+        "name": "Odoo ERP",
+        "description": "Système de gestion d'entreprise",
+        "icon": "📊",
+        "category": "native",
+        "url": "https://odoo.example.com",
+    },
+    {
+        "id": "app3",
+        "name": "Nextcloud",
+        "description": "Stockage et collaboration cloud",
+        "icon": "☁️",
+        "category": "native",
+        "url": "https://nextcloud.example.com",
+    },
+    {
+        "id": "app4",
+        "name": "GitLab CE",
+        "description": "Plateforme DevOps intégrée",
+        "icon": "🔧",
+        "category": "native",
+        "url": "https://gitlab.example.com",
+    },
+    {
+        "id": "app5",
+        "name": "Jira",
+        "description": "Gestion de projets Agile",
+        "icon": "📋",
+        "category": "native",
+        "url": "https://jira.example.com",
+    },
+    {
+        "id": "app6",
+        "name": "Confluence",
+        "description": "Espace de travail collaboratif",
+        "icon": "📝",
+        "category": "native",
+        "url": "https://confluence.example.com",
+    },
+    {
+        "id": "app7",
+        "name": "Mattermost",
+        "description": "Communication d'équipe sécurisée",
+        "icon": "💬",
+        "category": "native",
+        "url": "https://mattermost.example.com",
+    },
+    {
+        "id": "app8",
+        "name": "Grafana",
+        "description": "Monitoring et visualisation",
+        "icon": "📈",
+        "category": "native",
+        "url": "https://grafana.example.com",
+    },
+    # Portal secured applications
+    {
+        "id": "portal1",
+        "name": "Analytics Pro",
+        "description": "Analyse avancée des données",
+        "icon": "📊",
+        "category": "portal",
+    },
+    {
+        "id": "portal2",
+        "name": "CRM Manager",
+        "description": "Gestion de la relation client",
+        "icon": "👥",
+        "category": "portal",
+    },
+    {
+        "id": "portal3",
+        "name": "Invoice System",
+        "description": "Système de facturation",
+        "icon": "💰",
+        "category": "portal",
+    },
+    {
+        "id": "portal4",
+        "name": "Document Hub",
+        "description": "Centre de documentation",
+        "icon": "📁",
+        "category": "portal",
+    },
+    {
+        "id": "portal5",
+        "name": "Task Tracker",
+        "description": "Suivi des tâches et projets",
+        "icon": "✅",
+        "category": "portal",
+    },
+    {
+        "id": "portal6",
+        "name": "Report Builder",
+        "description": "Générateur de rapports",
+        "icon": "📄",
+        "category": "portal",
+    },
+    {
+        "id": "portal7",
+        "name": "Security Center",
+        "description": "Centre de sécurité",
+        "icon": "🔐",
+        "category": "portal",
+    },
+    {
+        "id": "portal8",
+        "name": "API Gateway",
+        "description": "Passerelle d'API",
+        "icon": "🔗",
+        "category": "portal",
+    },
+]
+
 # Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def hash_password(password: str, rounds: int = BCRYPT_DEFAULT_ROUNDS) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
 
 def verify_password(password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+def bcrypt_cost(hashed_password: str) -> Optional[int]:
+    # "$2b$12$<salt+hash>"
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+class PasswordHashingPolicy:
+    """Chooses the bcrypt cost for new hashes and flags stored hashes that should be upgraded."""
+
+    def __init__(self, rounds: Optional[int], target_ms: Optional[float], min_rounds: int, max_rounds: int):
+        self.rounds = rounds or BCRYPT_DEFAULT_ROUNDS
+        self.target_ms = None if rounds else target_ms
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+
+    async def calibrate(self):
+        """Pick the highest cost whose hash time stays within the target on this host."""
+        if not self.target_ms:
+            return
+        loop = asyncio.get_running_loop()
+        _, elapsed = await loop.run_in_executor(None, _timed_call, hash_password, "calibration", self.min_rounds)
+        # Every extra round doubles the work
+        rounds = self.min_rounds
+        while rounds < self.max_rounds and elapsed * 2 ** (rounds + 1 - self.min_rounds) * 1000 <= self.target_ms:
+            rounds += 1
+        self.rounds = rounds
+        logger.info(
+            "bcrypt cost calibrated to %d (%.1f ms at cost %d, target %.0f ms)",
+            rounds, elapsed * 1000, self.min_rounds, self.target_ms,
+        )
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        # Only upgrade: a stronger hash is kept, and workers that calibrated to
+        # different costs do not rewrite each other's hashes back and forth
+        cost = bcrypt_cost(hashed_password)
+        return cost is None or cost < self.rounds
+
+hashing_policy = PasswordHashingPolicy(BCRYPT_ROUNDS, BCRYPT_TARGET_MS, BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS)
+
+# Strong references to fire-and-forget tasks so they are not garbage collected mid-flight
+background_tasks = set()
+
+def spawn_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def rehash_password(username: str, password: str, old_hash: str):
+    """Upgrade a stored hash to the current policy after a successful login."""
+    try:
+        new_hash = await password_pool.run(hash_password, password, hashing_policy.rounds)
+    except HTTPException:
+        # Pool is saturated; the next login will try again
+        password_rehash_total.inc("deferred")
+        return
+    try:
+        # Only replace the hash we verified, in case the password changed meanwhile
+        result = await db.users.update_one(
+            {"username": username, "hashed_password": old_hash},
+            {"$set": {"hashed_password": new_hash}},
+        )
+    except PyMongoError:
+        logger.exception("Failed to store upgraded password hash for %s", username)
+        password_rehash_total.inc("failed")
+        return
+    invalidate_user(username)
+    password_rehash_total.inc("upgraded" if result.modified_count else "skipped")
+
+def process_executor(max_workers: int) -> ProcessPoolExecutor:
+    # Never fork: this process already runs Motor, sqlite and watchdog threads, and a
+    # forked child can inherit one of their locks mid-acquire and deadlock. Spawned
+    # workers start a fresh interpreter and import this module instead.
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _timed_call(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+class PasswordPool:
+    """Bounded executor running bcrypt work off the event loop.
+
+    At most ``size + max_queue`` jobs are admitted at once; anything beyond that
+    is rejected with a 503 so a login storm cannot grow latency without bound.
+    """
+
+    def __init__(self, kind: str, size: int, max_queue: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password pool kind: {kind}")
+        self.kind = kind
+        self.size = max(1, size)
+        self.max_queue = max(0, max_queue)
+        self._executor = None
+        self._in_flight = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.hash_seconds_total = 0.0
+        self.hash_seconds_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = process_executor(self.size)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="password")
+        return self._executor
+
+    async def run(self, func, *args):
+        operation = func.__name__
+        if self._in_flight >= self.size + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._in_flight += 1
+        self.submitted += 1
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            result, hash_seconds = await loop.run_in_executor(self._get_executor(), _timed_call, func, *args)
+        finally:
+            self._in_flight -= 1
+        wait_seconds = max(time.perf_counter() - started - hash_seconds, 0.0)
+        password_hash_duration.observe(hash_seconds, operation)
+        password_pool_wait_duration.observe(wait_seconds, operation)
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+        self.hash_seconds_total += hash_seconds
+        self.hash_seconds_max = max(self.hash_seconds_max, hash_seconds)
+        return result
+
+    def stats(self) -> dict:
+        completed = self.submitted - self._in_flight
+        return {
+            "kind": self.kind,
+            "size": self.size,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "wait_seconds_avg": self.wait_seconds_total / completed if completed else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+            "hash_seconds_avg": self.hash_seconds_total / completed if completed else 0.0,
+            "hash_seconds_max": self.hash_seconds_max,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_pool = PasswordPool(PASSWORD_POOL_KIND, PASSWORD_POOL_SIZE, PASSWORD_POOL_MAX_QUEUE)
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire ``ttl`` seconds after being stored."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+user_cache = TTLCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+# Same users kept much longer, only read while the database is unavailable
+last_known_users = TTLCache(USER_CACHE_MAX_SIZE, STALE_CACHE_TTL_SECONDS)
+
+class DatabaseUnavailable(HTTPException):
+    """Mongo failed, timed out or is behind an open breaker; surfaces as 503."""
+
+    def __init__(self, detail: str = "Database unavailable"):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(math.ceil(DB_BREAKER_RESET_SECONDS))},
+        )
+
+class CircuitBreaker:
+    """Deadline and circuit breaker for database calls on the request path.
+
+    Every call gets ``timeout`` seconds. After ``failure_threshold`` consecutive
+    timeouts or connection failures (network errors, server selection and pool wait
+    timeouts) the breaker opens and calls fail immediately instead of queueing behind
+    a stalled server. After ``reset_timeout`` one trial call is let through
+    (half-open): success closes the breaker, failure opens it again. Errors the server
+    answered with, such as duplicate keys, count as success and reach the caller as is.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.timeout = timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._trial = False
+
+    def _allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._trial = False
+        if self.state == "half_open":
+            if self._trial:
+                return False
+            self._trial = True
+        return True
+
+    def _open(self):
+        if self.state != "open":
+            self.opened += 1
+            logger.warning("Database circuit breaker opened after %d failures", self.failures)
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    async def call(self, operation):
+        """Await ``operation()``; raise DatabaseUnavailable on failure or while open."""
+        if not self._allow():
+            self.rejected += 1
+            raise DatabaseUnavailable()
+        try:
+            result = await asyncio.wait_for(operation(), self.timeout)
+        except (asyncio.TimeoutError, ConnectionFailure, ExecutionTimeout) as exc:
+            if not isinstance(exc, ConnectionFailure):
+                self.timeouts += 1
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self._open()
+            raise DatabaseUnavailable() from exc
+        except PyMongoError:
+            # The server answered; the request was at fault, not the database
+            self._close()
+            raise
+        except BaseException:
+            # Not the database's fault (e.g. cancellation); let the next call be the trial
+            self._trial = False
+            raise
+        self._close()
+        return result
+
+    def _close(self):
+        if self.state != "closed":
+            logger.info("Database circuit breaker closed")
+        self.state = "closed"
+        self.failures = 0
+
+    def stats(self) -> dict:
+        return {
+            "open": int(self.state == "open"),
+            "half_open": int(self.state == "half_open"),
+            "consecutive_failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+db_breaker = CircuitBreaker(DB_BREAKER_FAILURE_THRESHOLD, DB_BREAKER_RESET_SECONDS, DB_OPERATION_TIMEOUT_SECONDS)
+
+def create_shared_state() -> SharedStateBackend:
+    if SHARED_STATE_BACKEND == "file":
+        return FileStateBackend(SHARED_STATE_PATH, SHARED_STATE_POLL_SECONDS)
+    if SHARED_STATE_BACKEND == "redis":
+        return RedisStateBackend(SHARED_STATE_REDIS_URL, SHARED_STATE_KEY_PREFIX)
+    if SHARED_STATE_BACKEND != "local":
+        raise ValueError(f"Unknown shared state backend: {SHARED_STATE_BACKEND}")
+    return SharedStateBackend()
+
+shared_state = create_shared_state()
+
+class LoginRateLimiter:
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+        self.limits = (
+            ("ip", LOGIN_IP_REFILL_PER_MINUTE / 60, LOGIN_IP_BURST),
+            ("user", LOGIN_USER_REFILL_PER_MINUTE / 60, LOGIN_USER_BURST),
+        )
+
+    async def check(self, ip: str, username: str):
+        keys = {"ip": ip, "user": username.lower()}
+        for scope, rate, capacity in self.limits:
+            retry_after = await self.backend.take(f"login:{scope}:{keys[scope]}", rate, capacity)
+            if retry_after > 0:
+                login_rate_limited_total.inc(scope)
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts, please retry later",
+                    headers={"Retry-After": str(min(math.ceil(retry_after), 3600))},
+                )
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+login_rate_limiter = LoginRateLimiter(shared_state.rate_limit_backend(RATE_LIMIT_MAX_KEYS))
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def invalidate_user(username: str):
+    shared_state.publish("invalidate_user", {"username": username})
+
+def _drop_cached_user(event: dict):
+    user_cache.pop(event["username"])
+    last_known_users.pop(event["username"])
+
+shared_state.subscribe("invalidate_user", _drop_cached_user)
+
+async def update_user(username: str, changes: dict) -> bool:
+    result = await db_breaker.call(lambda: db.users.update_one(
+        {"username": username},
+        {"$set": {**changes, "updated_at": datetime.utcnow()}},
+    ))
+    invalidate_user(username)
+    return result.matched_count > 0
+
+async def deactivate_user(username: str) -> bool:
+    shared_state.publish("revoke_user", {"username": username, "revoked_at": time.time()})
+    await revoke_user_sessions(username)
+    return await update_user(username, {"is_active": False})
+
+# Indexes created at startup, per collection: (keys, create_index options)
+INDEX_SPECS = {
+    "users": [
+        ("username", {"unique": True}),
+        ("email", {}),
+        ("id", {"unique": True}),
+        ("groups", {}),
+        # Admin listing: keyset pagination, optionally per active flag, and word search
+        ([("created_at", -1), ("id", -1)], {}),
+        ([("is_active", 1), ("created_at", -1), ("id", -1)], {}),
+        ([("username", "text"), ("email", "text"), ("full_name", "text")], {"name": "users_text"}),
+    ],
+    "sessions": [
+        ("id", {"unique": True}),
+        ("token_hash", {"unique": True}),
+        ("previous_token_hash", {}),
+        ("username", {}),
+        # Mongo removes sessions once expires_at has passed
+        ("expires_at", {"expireAfterSeconds": 0}),
+    ],
+    "applications": [
+        ("id", {"unique": True}),
+        ("category", {}),
+        ("is_active", {}),
+        ("name", {}),
+        ([("is_active", 1), ("category", 1), ("name", 1), ("id", 1)], {}),
+        ([("is_active", 1), ("name", 1), ("id", 1)], {}),
+    ],
+    "audit_events": [
+        ([("username", 1), ("at", -1)], {}),
+        ([("event", 1), ("at", -1)], {}),
+    ],
+    "entitlements": [
+        ([("principal_type", 1), ("principal_id", 1), ("app_id", 1)], {"unique": True}),
+        ("app_id", {}),
+    ],
+}
+
+# Build result of every index in INDEX_SPECS, keyed by "<collection>.<index name>"
+index_status = {}
+
+def index_name(keys, options: dict) -> str:
+    """The name Mongo gives an index unless its options set one."""
+    if "name" in options:
+        return options["name"]
+    keys = [(keys, 1)] if isinstance(keys, str) else keys
+    return "_".join(f"{key}_{direction}" for key, direction in keys)
+
+async def ensure_index(collection_name: str, keys, options: dict) -> bool:
+    started = time.perf_counter()
+    name = index_name(keys, options)
+    try:
+        await db[collection_name].create_index(keys, **options)
+    except PyMongoError as e:
+        index_status[f"{collection_name}.{name}"] = {"ready": False, "error": str(e)}
+        logger.error("Failed to build index %s on %s: %s", name, collection_name, e)
+        return False
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    index_status[f"{collection_name}.{name}"] = {"ready": True, "build_ms": round(elapsed_ms, 2)}
+    logger.info("Index %s on %s ready (%.1f ms)", name, collection_name, elapsed_ms)
+    return True
+
+async def ensure_indexes():
+    """Build every index in INDEX_SPECS.
+
+    A missing secondary index only slows queries down, but writes such as
+    registration rely on the unique ones to reject duplicates, so this raises
+    (and startup warmup retries) until all unique indexes are built.
+    """
+    specs = [
+        (collection_name, keys, options)
+        for collection_name, collection_specs in INDEX_SPECS.items()
+        for keys, options in collection_specs
+    ]
+    # Issued concurrently: on an existing deployment each call is a round trip that finds the index already built
+    built = await asyncio.gather(*(ensure_index(*spec) for spec in specs))
+    missing = [
+        f"{collection_name}.{index_name(keys, options)}"
+        for (collection_name, keys, options), ok in zip(specs, built)
+        if not ok and options.get("unique")
+    ]
+    if missing:
+        raise RuntimeError(f"Unique indexes not built: {', '.join(missing)}")
+
+class Subscription:
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(queue_size)
+        self.lagged = False
+
+class EventBroadcaster:
+    """Fans in-process events out to every connected event stream.
+
+    Each stream has its own bounded queue, so a slow client cannot hold up the
+    others or grow memory without bound. When its queue is full, the event is
+    dropped for that client only and the stream tells it to resync instead.
+    """
+
+    def __init__(self, queue_size: int, max_clients: int):
+        self.queue_size = max(1, queue_size)
+        self.max_clients = max_clients
+        self._subscriptions = set()
+        self.published = 0
+        self.dropped = 0
+
+    def full(self) -> bool:
+        return len(self._subscriptions) >= self.max_clients
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    def publish(self, kind: str, payload: dict):
+        if not self._subscriptions:
+            return
+        self.published += 1
+        event = (kind, payload)
+        for subscription in self._subscriptions:
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.lagged = True
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        return {"clients": len(self._subscriptions), "published": self.published, "dropped": self.dropped}
+
+event_broadcaster = EventBroadcaster(SSE_CLIENT_QUEUE_SIZE, SSE_MAX_CLIENTS)
+
+# Cached users are reloaded by their streams, which may change their groups or deactivate them
+shared_state.subscribe("invalidate_user", lambda event: event_broadcaster.publish("user", event))
+
+class ApplicationCatalog:
+    """In-memory view of the active applications.
+
+    Writers bump a revision counter in ``catalog_meta``; every worker polls that
+    single document and only reloads when it has moved. Per-user catalog bodies
+    are serialized by ``EntitlementIndex.catalog``, keyed by the revision.
+    """
+
+    def __init__(self):
+        self.applications: List[Application] = []
+        self.by_id = {}
+        self.revision = None
+        self._refresh_task = None
+
+    async def load(self):
+        meta = await db_breaker.call(lambda: db.catalog_meta.find_one({"_id": "applications"}))
+        revision = meta["revision"] if meta else 0
+        docs = await db_breaker.call(
+            lambda: db.applications.find({"is_active": True}, {"_id": 0}).sort("_id", 1).to_list(None)
+        )
+        applications = [Application(**doc) for doc in docs]
+        previous = self.by_id
+        self.applications = applications
+        self.by_id = {application.id: application for application in applications}
+        self.revision = revision
+        changed = [application.id for application in applications if previous.get(application.id) != application]
+        removed = [app_id for app_id in previous if app_id not in self.by_id]
+        if previous and (changed or removed):
+            event_broadcaster.publish("catalog", {"changed": changed, "removed": removed})
+
+    async def refresh(self):
+        meta = await db_breaker.call(lambda: db.catalog_meta.find_one({"_id": "applications"}))
+        if (meta["revision"] if meta else 0) != self.revision:
+            await self.load()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(CATALOG_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except DatabaseUnavailable:
+                # Keep serving the last loaded catalog; the breaker logs the outage
+                pass
+            except Exception:
+                logger.exception("Failed to refresh application catalog")
+
+    def start(self):
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+application_catalog = ApplicationCatalog()
+
+async def bump_catalog_revision():
+    await db_breaker.call(
+        lambda: db.catalog_meta.update_one({"_id": "applications"}, {"$inc": {"revision": 1}}, upsert=True)
+    )
+    await application_catalog.load()
+
+async def save_application(application: Application):
+    await db_breaker.call(
+        lambda: db.applications.replace_one({"id": application.id}, application.model_dump(), upsert=True)
+    )
+    await bump_catalog_revision()
+
+async def delete_application(app_id: str) -> bool:
+    result = await db_breaker.call(lambda: db.applications.delete_one({"id": app_id}))
+    await bump_catalog_revision()
+    return result.deleted_count > 0
+
+async def seed_applications():
+    if await db.applications.count_documents({}, limit=1):
+        return
+    try:
+        await db.applications.insert_many(
+            [Application(**app_data).model_dump() for app_data in DEFAULT_APPLICATIONS],
+            ordered=False,
+        )
+    except BulkWriteError:
+        # Another worker seeded concurrently; the unique id index kept it consistent
+        pass
+    await db.catalog_meta.update_one({"_id": "applications"}, {"$inc": {"revision": 1}}, upsert=True)
+    logger.info("Seeded applications collection with %d applications", len(DEFAULT_APPLICATIONS))
+
+class HealthProber:
+    """Probes application URLs in the background and keeps the latest status in memory.
+
+    Requests only read ``statuses``; ``version`` moves whenever a status changes so
+    that serialized catalogs get rebuilt. Probes share one keep-alive client and run
+    concurrently, and rounds are jittered so workers do not probe in lockstep.
+    """
+
+    def __init__(self, interval: float, jitter: float, timeout: float, concurrency: int):
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.statuses = {}
+        self.checked_at = None
+        self.version = 0
+        self._client = None
+        self._semaphore = None
+        self._task = None
+
+    def status(self, app_id: str) -> str:
+        return self.statuses.get(app_id, "unknown")
+
+    async def probe(self, url: str) -> str:
+        import httpx
+
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self._client.get(url)
+                result = "up" if response.status_code < 500 else "down"
+            except httpx.HTTPError:
+                result = "down"
+            health_probe_duration.observe(time.perf_counter() - started, result)
+            return result
+
+    async def probe_all(self):
+        targets = [application for application in application_catalog.applications if application.url]
+        results = await asyncio.gather(*(self.probe(application.url) for application in targets))
+        statuses = {application.id: result for application, result in zip(targets, results)}
+        self.checked_at = datetime.utcnow()
+        if statuses != self.statuses:
+            changed = {
+                app_id: statuses.get(app_id, "unknown")
+                for app_id in statuses.keys() | self.statuses.keys()
+                if statuses.get(app_id) != self.statuses.get(app_id)
+            }
+            self.statuses = statuses
+            self.version += 1
+            event_broadcaster.publish("status", {"statuses": changed})
+
+    async def _probe_loop(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception:
+                logger.exception("Application health probe failed")
+            await asyncio.sleep(self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def start(self):
+        # httpx is only needed once probing starts; importing it lazily keeps it off the import path
+        import httpx
+
+        if self._task is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+                headers={"User-Agent": "SyncLogic-Portal-HealthProbe"},
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        values = list(self.statuses.values())
+        return {"up": values.count("up"), "down": values.count("down"), "version": self.version}
+
+health_prober = HealthProber(
+    HEALTH_PROBE_INTERVAL_SECONDS, HEALTH_PROBE_JITTER, HEALTH_PROBE_TIMEOUT_SECONDS, HEALTH_PROBE_CONCURRENCY
+)
+
+def application_payload(application: Application) -> dict:
+    return {**application.model_dump(mode="json"), "status": health_prober.status(application.id)}
+
+class EntitlementIndex:
+    """Materialized application lists per user.
+
+    A user's list is the union of their direct grants and the grants of every
+    group they belong to, ALL_USERS_GROUP included. Group grants are cached per
+    group and every cached user list remembers the group generations it was built
+    from, so a change to one group only rebuilds the lists of its members. The
+    serialized catalog is shared by all users with the same list.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float):
+        self.users = TTLCache(maxsize, ttl)
+        self.groups = TTLCache(maxsize, ttl)
+        self.bodies = TTLCache(maxsize, ttl)
+        # Lists kept past their TTL, served only while the database is unavailable
+        self.last_known = TTLCache(maxsize, stale_ttl)
+        # Generation of every recently invalidated principal, oldest first. Values come
+        # from one increasing clock; forgotten principals read as the floor, which is at
+        # least their last value, so lists stamped before they were forgotten are rebuilt.
+        self.max_generations = max(2, maxsize)
+        self._generations = {}
+        self._clock = 0
+        self._floor = 0
+
+    @staticmethod
+    def groups_of(user: User) -> tuple:
+        return (ALL_USERS_GROUP, *user.groups)
+
+    def _generation(self, principal_type: str, principal_id: str) -> int:
+        return self._generations.get((principal_type, principal_id), self._floor)
+
+    def _bump(self, principal_type: str, principal_id: str):
+        key = (principal_type, principal_id)
+        self._clock += 1
+        self._generations.pop(key, None)
+        self._generations[key] = self._clock
+        if len(self._generations) > self.max_generations:
+            while len(self._generations) > self.max_generations // 2:
+                self._floor = self._generations.pop(next(iter(self._generations)))
+
+    def _stamp(self, user: User) -> tuple:
+        groups = self.groups_of(user)
+        return (
+            self._generation("user", user.id),
+            groups,
+            tuple(self._generation("group", group_id) for group_id in groups),
+        )
+
+    @staticmethod
+    async def _granted(principal_type: str, principal_id: str) -> set:
+        docs = await db_breaker.call(lambda: db.entitlements.find(
+            {"principal_type": principal_type, "principal_id": principal_id},
+            {"_id": 0, "app_id": 1},
+        ).to_list(None))
+        return {doc["app_id"] for doc in docs}
+
+    async def _group_app_ids(self, group_ids) -> frozenset:
+        """Union of the grants of ``group_ids``, reading every uncached group in one query."""
+        app_ids = set()
+        missing = []
+        for group_id in group_ids:
+            cached = self.groups.get(group_id)
+            if cached is None:
+                missing.append(group_id)
+            else:
+                app_ids |= cached
+        if missing:
+            generations = {group_id: self._generation("group", group_id) for group_id in missing}
+            docs = await db_breaker.call(lambda: db.entitlements.find(
+                {"principal_type": "group", "principal_id": {"$in": missing}},
+                {"_id": 0, "principal_id": 1, "app_id": 1},
+            ).to_list(None))
+            granted = {group_id: set() for group_id in missing}
+            for doc in docs:
+                granted[doc["principal_id"]].add(doc["app_id"])
+            for group_id, group_app_ids in granted.items():
+                # Skip caching groups that changed while they were being read
+                if self._generation("group", group_id) == generations[group_id]:
+                    self.groups.set(group_id, frozenset(group_app_ids))
+                app_ids |= group_app_ids
+        return frozenset(app_ids)
+
+    async def app_ids(self, user: User) -> frozenset:
+        stamp = self._stamp(user)
+        cached = self.users.get(user.id)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            app_ids = await self._granted("user", user.id)
+            app_ids |= await self._group_app_ids(self.groups_of(user))
+        except DatabaseUnavailable:
+            # Only a list built from the same grants and groups is good enough
+            last_known = self.last_known.get(user.id)
+            if last_known is None or last_known[0] != stamp:
+                stale_fallback_total.inc("entitlements", "miss")
+                raise
+            stale_fallback_total.inc("entitlements", "hit")
+            return last_known[1]
+        app_ids = frozenset(app_ids)
+        if self._stamp(user) == stamp:
+            self.users.set(user.id, (stamp, app_ids))
+            self.last_known.set(user.id, (stamp, app_ids))
+        return app_ids
+
+    async def catalog(self, user: User) -> tuple:
+        """(body, etag) of the active applications the user is entitled to."""
+        app_ids = await self.app_ids(user)
+        key = (application_catalog.revision, health_prober.version, app_ids)
+        cached = self.bodies.get(key)
+        if cached is None:
+            body = dumps_json([
+                application_payload(application)
+                for application in application_catalog.applications
+                if application.id in app_ids
+            ])
+            cached = (body, f'"{application_catalog.revision}-{hashlib.sha256(body).hexdigest()[:16]}"')
+            self.bodies.set(key, cached)
+        return cached
+
+    async def warm(self):
+        await self._group_app_ids((ALL_USERS_GROUP,))
+
+    def invalidate(self, principal_type: str, principal_id: str):
+        self._bump(principal_type, principal_id)
+        if principal_type == "group":
+            self.groups.pop(principal_id)
+        else:
+            self.users.pop(principal_id)
+            self.last_known.pop(principal_id)
+        event_broadcaster.publish("entitlements", {"principal_type": principal_type, "principal_id": principal_id})
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self.users),
+            "groups": len(self.groups),
+            "bodies": len(self.bodies),
+            "generations": len(self._generations),
+            "hits": self.users.hits,
+            "misses": self.users.misses,
+        }
+
+entitlement_index = EntitlementIndex(
+    ENTITLEMENT_CACHE_MAX_SIZE, ENTITLEMENT_CACHE_TTL_SECONDS, STALE_CACHE_TTL_SECONDS
+)
+
+shared_state.subscribe(
+    "invalidate_entitlements",
+    lambda event: entitlement_index.invalidate(event["principal_type"], event["principal_id"]),
+)
+
+async def set_entitlement(principal_type: str, principal_id: str, app_id: str, granted: bool) -> bool:
+    """Grant or revoke one application; returns whether anything changed."""
+    selector = {"principal_type": principal_type, "principal_id": principal_id, "app_id": app_id}
+    if granted:
+        result = await db_breaker.call(lambda: db.entitlements.update_one(
+            selector, {"$setOnInsert": {"granted_at": datetime.utcnow()}}, upsert=True
+        ))
+        changed = result.upserted_id is not None
+    else:
+        result = await db_breaker.call(lambda: db.entitlements.delete_one(selector))
+        changed = result.deleted_count > 0
+    if changed:
+        shared_state.publish(
+            "invalidate_entitlements", {"principal_type": principal_type, "principal_id": principal_id}
+        )
+    return changed
+
+async def set_group_membership(username: str, group_id: str, member: bool) -> bool:
+    update = {"$addToSet" if member else "$pull": {"groups": group_id}}
+    result = await db_breaker.call(lambda: db.users.update_one(
+        {"username": username},
+        {**update, "$set": {"updated_at": datetime.utcnow()}},
+    ))
+    # The cached user carries its groups, which are part of its entitlement stamp
+    invalidate_user(username)
+    return result.matched_count > 0
+
+async def seed_entitlements():
+    """Grant every existing application to ALL_USERS_GROUP, once per database.
+
+    A marker in ``catalog_meta`` records that this happened, so an admin who later
+    revokes every grant does not get them all back on the next restart.
+    """
+    if await db.catalog_meta.find_one({"_id": "entitlements_seeded"}):
+        return
+    # Databases seeded before the marker existed already hold their grants
+    if not await db.entitlements.count_documents({}, limit=1):
+        app_ids = await db.applications.distinct("id")
+        if not app_ids:
+            return
+        now = datetime.utcnow()
+        try:
+            await db.entitlements.insert_many(
+                [
+                    {"principal_type": "group", "principal_id": ALL_USERS_GROUP, "app_id": app_id, "granted_at": now}
+                    for app_id in app_ids
+                ],
+                ordered=False,
+            )
+        except BulkWriteError:
+            # Another worker seeded concurrently; the unique index kept it consistent
+            pass
+        logger.info("Granted %d applications to %s", len(app_ids), ALL_USERS_GROUP)
+    await db.catalog_meta.update_one(
+        {"_id": "entitlements_seeded"}, {"$setOnInsert": {"seeded_at": datetime.utcnow()}}, upsert=True
+    )
+
+def dumps_json(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+def model_response(model: BaseModel) -> Response:
+    """Serialize an already validated model without FastAPI's response_model round trip."""
+    return Response(content=model.model_dump_json().encode("utf-8"), media_type="application/json")
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+
+def not_modified_response(etag: str, headers: Optional[dict] = None) -> Response:
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL}
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+def cached_response(request: Request, body: bytes, etag: str, headers: Optional[dict] = None) -> Response:
+    """Serve body as JSON with validators, or an empty 304 when the client already has it."""
+    if etag_matches(request, etag):
+        return not_modified_response(etag, headers)
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def user_etag(user: User) -> str:
+    changed_at = user.updated_at or user.created_at
+    return f'"{user.id}-{int(changed_at.timestamp() * 1000000)}"'
+
+def encode_cursor(*values: str) -> str:
+    raw = json.dumps(values, ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int = 2) -> list:
+    """The ``size`` string sort keys packed by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(value, str) for value in values):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in ApplicationWithStatus.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return requested
+
+async def query_applications(
+    app_ids: frozenset,
+    category: Optional[str],
+    q: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[List[str]],
+):
+    conditions = [{"is_active": True}, {"id": {"$in": list(app_ids)}}]
+    if category:
+        conditions.append({"category": category})
+    if q:
+        pattern = {"$regex": re.escape(q), "$options": "i"}
+        conditions.append({"$or": [{"name": pattern}, {"description": pattern}]})
+    if cursor:
+        name, app_id = decode_cursor(cursor)
+        conditions.append({"$or": [{"name": {"$gt": name}}, {"name": name, "id": {"$gt": app_id}}]})
+
+    projection = {"_id": 0}
+    if fields:
+        # name and id are always fetched because the cursor is built from them
+        projection.update({field: 1 for field in {*fields, "name", "id"} - {"status"}})
+
+    find = db.applications.find({"$and": conditions}, projection).sort([("name", 1), ("id", 1)])
+    if limit:
+        find = find.limit(limit + 1)
+    docs = await db_breaker.call(lambda: find.to_list(None))
+
+    next_cursor = None
+    if limit and len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["name"], docs[-1]["id"])
+    for doc in docs:
+        doc["status"] = health_prober.status(doc["id"])
+    if fields:
+        docs = [{field: doc.get(field) for field in fields} for doc in docs]
+    return docs, next_cursor
+
+class AuditLog:
+    """Buffered audit trail that never makes a request wait on the database.
+
+    ``record`` only appends to a bounded queue; when it is full the event is dropped
+    and counted. A background task drains the queue into the capped audit_events
+    collection with batched insert_many calls. Batches that fail or exceed
+    AUDIT_WRITE_TIMEOUT_SECONDS are appended to a per-process spill file and replayed
+    once a write succeeds again. Events carry their _id from the start, so a batch
+    that was written despite timing out is not duplicated by the replay. Nothing is
+    written before ``database_ready`` is set, since an early insert would create
+    audit_events uncapped. stop() lets the task finish the queue instead of
+    cancelling it mid-batch.
+    """
+
+    _STOP = object()
+
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float, write_timeout: float, spill_dir: str):
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.write_timeout = write_timeout
+        self.spill_dir = spill_dir
+        self.spill_path = os.path.join(spill_dir, f"audit-{os.getpid()}.ndjson")
+        self._queue = None
+        self._task = None
+        self._database_ready = None
+        self._accepting = False
+        self._pending = []
+        self._spilled = False
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+
+    def record(self, event: str, **fields):
+        if not self._accepting:
+            return
+        # The bound is enforced here rather than by the queue so that stop() can always enqueue _STOP
+        if self._queue.qsize() >= self.queue_size:
+            self.dropped += 1
+            audit_events_total.inc("dropped")
+            return
+        self._queue.put_nowait({"_id": ObjectId(), "event": event, "at": datetime.utcnow(), **fields})
+
+    async def _fill_pending(self) -> bool:
+        """Collect up to batch_size events, waiting at most flush_interval after the first.
+
+        Returns True once stop() has been called and everything before it was collected.
+        """
+        event = await self._queue.get()
+        if event is self._STOP:
+            return True
+        self._pending.append(event)
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._pending) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if event is self._STOP:
+                return True
+            self._pending.append(event)
+        return False
+
+    async def _insert(self, docs: list):
+        try:
+            await asyncio.wait_for(db.audit_events.insert_many(docs, ordered=False), self.write_timeout)
+        except BulkWriteError as e:
+            # Documents from an earlier attempt that timed out but still landed
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    async def _write(self, batch: list):
+        try:
+            await self._insert(batch)
+        except (PyMongoError, asyncio.TimeoutError) as e:
+            logger.warning("Audit write of %d events failed, spilling to %s: %s", len(batch), self.spill_path, e)
+            await asyncio.to_thread(self._append_spill, batch)
+            self._spilled = True
+            self.spilled += len(batch)
+            audit_events_total.inc("spilled", amount=len(batch))
+            return
+        self.written += len(batch)
+        audit_events_total.inc("written", amount=len(batch))
+        if self._spilled:
+            await self._replay(self.spill_path)
+
+    def _append_spill(self, docs: list):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            f.writelines(json_util.dumps(doc) + "\n" for doc in docs)
+
+    @staticmethod
+    def _claim_spill(path: str) -> list:
+        """Move the spill file aside (unless an earlier replay is unfinished) and read it."""
+        replay_path = f"{path}.replay"
+        if not os.path.exists(replay_path):
+            try:
+                os.replace(path, replay_path)
+            except FileNotFoundError:
+                return []
+        with open(replay_path, encoding="utf-8") as f:
+            return [json_util.loads(line) for line in f if line.strip()]
+
+    async def _replay(self, path: str):
+        while True:
+            docs = await asyncio.to_thread(self._claim_spill, path)
+            if not docs:
+                break
+            for start in range(0, len(docs), self.batch_size):
+                try:
+                    await self._insert(docs[start:start + self.batch_size])
+                except (PyMongoError, asyncio.TimeoutError):
+                    # The .replay file is kept and retried after the next successful write
+                    return
+            await asyncio.to_thread(os.remove, f"{path}.replay")
+            audit_events_total.inc("replayed", amount=len(docs))
+            logger.info("Replayed %d spilled audit events from %s", len(docs), path)
+        if path == self.spill_path:
+            self._spilled = False
+
+    def _orphaned_spills(self) -> list:
+        """Spill files of this process and of worker processes that no longer exist."""
+        paths = []
+        for name in os.listdir(self.spill_dir) if os.path.isdir(self.spill_dir) else ():
+            match = re.fullmatch(r"audit-(\d+)\.ndjson(\.replay)?", name)
+            if not match:
+                continue
+            pid = int(match.group(1))
+            if pid != os.getpid():
+                try:
+                    os.kill(pid, 0)
+                    continue
+                except ProcessLookupError:
+                    pass
+                except PermissionError:
+                    continue
+            path = os.path.join(self.spill_dir, f"audit-{pid}.ndjson")
+            if path not in paths:
+                paths.append(path)
+        return paths
+
+    async def _drain_loop(self):
+        await self._database_ready.wait()
+        for path in self._orphaned_spills():
+            await self._replay(path)
+        while True:
+            stopping = await self._fill_pending()
+            if self._pending:
+                try:
+                    await self._write(self._pending)
+                except Exception:
+                    logger.exception("Failed to write %d audit events", len(self._pending))
+                self._pending = []
+            if stopping:
+                return
+
+    def start(self, database_ready: asyncio.Event):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._database_ready = database_ready
+            self._accepting = True
+            self._task = asyncio.create_task(self._drain_loop())
+
+    async def stop(self):
+        """Stop accepting events and wait until the queued ones are written or spilled."""
+        if self._task is None:
+            return
+        self._accepting = False
+        task, self._task = self._task, None
+        if not self._database_ready.is_set():
+            # Still waiting for the database: spill the queue for the next start to replay
+            task.cancel()
+            docs = []
+            while not self._queue.empty():
+                docs.append(self._queue.get_nowait())
+            if docs:
+                await asyncio.to_thread(self._append_spill, docs)
+                self.spilled += len(docs)
+                audit_events_total.inc("spilled", amount=len(docs))
+            return
+        self._queue.put_nowait(self._STOP)
+        await task
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._accepting else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+        }
+
+audit_log = AuditLog(
+    AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_SECONDS, AUDIT_WRITE_TIMEOUT_SECONDS, AUDIT_SPILL_DIR
+)
+
+async def ensure_audit_collection():
+    """Create audit_events as a capped collection before ensure_indexes would create it uncapped."""
+    if not AUDIT_COLLECTION_SIZE_BYTES:
+        return
+    if "audit_events" in await db.list_collection_names(filter={"name": "audit_events"}):
+        return
+    try:
+        await db.create_collection("audit_events", capped=True, size=AUDIT_COLLECTION_SIZE_BYTES)
+    except PyMongoError as e:
+        # Usually another worker created it first
+        logger.info("Audit collection not created: %s", e)
+
+# Fields of UserResponse plus the pagination key; hashed_password never leaves the database
+USER_LIST_PROJECTION = {"_id": 0, "id": 1, "username": 1, "email": 1, "full_name": 1, "is_active": 1, "created_at": 1}
+user_list_adapter = TypeAdapter(List[UserResponse])
+
+async def query_users(
+    q: Optional[str],
+    username: Optional[str],
+    email: Optional[str],
+    is_active: Optional[bool],
+    limit: int,
+    cursor: Optional[str],
+):
+    """One page of users, newest first, and the cursor of the next page.
+
+    username and email are prefix matches, which use their indexes; q is a word
+    search over the users_text index.
+    """
+    conditions = []
+    if q:
+        conditions.append({"$text": {"$search": q}})
+    if username:
+        conditions.append({"username": {"$regex": "^" + re.escape(username)}})
+    if email:
+        conditions.append({"email": {"$regex": "^" + re.escape(email)}})
+    if is_active is not None:
+        conditions.append({"is_active": is_active})
+    if cursor:
+        created_at, user_id = decode_cursor(cursor)
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        conditions.append({"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": user_id}},
+        ]})
+
+    query = {"$and": conditions} if conditions else {}
+    find = db.users.find(query, USER_LIST_PROJECTION).sort([("created_at", -1), ("id", -1)]).limit(limit + 1)
+    docs = await db_breaker.call(lambda: find.to_list(None))
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["created_at"].isoformat(), docs[-1]["id"])
+    # Rows come from our own writes and are already shaped by the projection
+    return [UserResponse.model_construct(**doc) for doc in docs], next_cursor
+
+async def bootstrap_database():
+    await ensure_audit_collection()
+    await ensure_indexes()
+    await seed_applications()
+    await seed_entitlements()
+    await application_catalog.load()
+
+class RevocationList:
+    """Revoked token ids and users, kept only until the affected tokens would expire anyway."""
+
+    def __init__(self, retention_seconds: float):
+        self.retention_seconds = retention_seconds
+        self._tokens = {}  # jti -> token expiry (unix time)
+        self._users = {}  # username -> revocation time (unix time)
+        self._next_prune = 0.0
+
+    def revoke_token(self, jti: str, expires_at: float):
+        self._tokens[jti] = expires_at
+        self._prune()
+
+    def revoke_user(self, username: str, revoked_at: Optional[float] = None):
+        revoked_at = revoked_at if revoked_at is not None else time.time()
+        # Replayed events can arrive out of order; the latest revocation wins
+        self._users[username] = max(revoked_at, self._users.get(username, 0.0))
+        self._prune()
+
+    def is_revoked(self, claims: dict) -> bool:
+        if self._tokens and claims.get("jti") in self._tokens:
+            return True
+        if self._users:
+            revoked_at = self._users.get(claims.get("sub"))
+            if revoked_at is not None and claims.get("iat", 0) <= revoked_at:
+                return True
+        return False
+
+    def _prune(self):
+        now = time.time()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+        self._users = {name: at for name, at in self._users.items() if at + self.retention_seconds > now}
+
+revocations = RevocationList(ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+# Retained so that a worker starting after a logout still rejects the token until it expires
+shared_state.subscribe(
+    "revoke_token",
+    lambda event: revocations.revoke_token(event["jti"], event["exp"]),
+    retain_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+shared_state.subscribe(
+    "revoke_user",
+    lambda event: revocations.revoke_user(event["username"], event["revoked_at"]),
+    retain_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+token_claims_cache = TTLCache(JWT_CLAIMS_CACHE_MAX_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
-    to_encode.update({"exp": expire})
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    # Sub-second iat: user revocations compare it with the revocation time, and a whole
+    # second would also revoke tokens issued right after a reactivation
+    to_encode.update({"exp": expire, "iat": round(time.time(), 3), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def decode_access_token(token: str) -> dict:
+    if not JWT_FAST_PATH:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    digest = hashlib.sha256(token.encode('utf-8')).digest()
+    claims = token_claims_cache.get(digest)
+    if claims is None:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        ttl = claims["exp"] - time.time()
+        if ttl > 0:
+            token_claims_cache.set(digest, claims, ttl=ttl)
+    elif claims["exp"] <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    return claims
+
+app_token_cache = TTLCache(APP_TOKEN_CACHE_MAX_SIZE, APP_TOKEN_TTL_SECONDS)
+
+def issue_app_token(user: User, app_id: str) -> AppAccessToken:
+    """Sign a token scoped to one application, reusing a cached one while it is fresh enough."""
+    now = time.time()
+    cached = app_token_cache.get((user.id, app_id))
+    if cached is not None:
+        token, expires_at = cached
+        if expires_at - now >= APP_TOKEN_REUSE_MIN_SECONDS:
+            return AppAccessToken(access_token=token, app_id=app_id, expires_in=int(expires_at - now))
+    expires_at = int(now) + APP_TOKEN_TTL_SECONDS
+    token = jwt.encode(
+        {
+            "sub": user.id,
+            "username": user.username,
+            "aud": app_id,
+            "scope": "app_access",
+            "iat": int(now),
+            "exp": expires_at,
+            "jti": uuid.uuid4().hex,
+        },
+        APP_TOKEN_SECRET,
+        algorithm=JWT_ALGORITHM,
+    )
+    app_token_cache.set((user.id, app_id), (token, expires_at), ttl=expires_at - now)
+    return AppAccessToken(access_token=token, app_id=app_id, expires_in=APP_TOKEN_TTL_SECONDS)
+
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = decode_access_token(credentials.credentials)
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(
@@ -106,29 +2465,366 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user = await db.users.find_one({"username": username})
+    if revocations.is_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if payload.get("active") is False:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+async def load_user(username: str) -> Optional[User]:
+    user = user_cache.get(username)
+    if user is None:
+        try:
+            user_doc = await db_breaker.call(lambda: db.users.find_one({"username": username}))
+        except DatabaseUnavailable:
+            # Already-authenticated users keep working from their last known record
+            user = last_known_users.get(username)
+            stale_fallback_total.inc("user", "miss" if user is None else "hit")
+            if user is None:
+                raise
+            return user
+        if user_doc is None:
+            return None
+        user = User(**user_doc)
+        user_cache.set(username, user)
+        last_known_users.set(username, user)
+    return user
+
+async def get_current_user(claims: dict = Depends(get_token_claims)):
+    user = await load_user(claims["sub"])
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return User(**user)
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+def is_admin(user: User) -> bool:
+    return user.is_admin or user.username in ADMIN_USERNAMES
+
+async def get_current_admin(current_user: User = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator privileges required"
+        )
+    return current_user
+
+def hash_passwords(passwords: List[str], rounds: int) -> List[str]:
+    return [hash_password(password, rounds) for password in passwords]
+
+_bulk_executor = None
+
+def get_bulk_executor() -> ProcessPoolExecutor:
+    # Separate from password_pool so a large import cannot starve interactive logins
+    global _bulk_executor
+    if _bulk_executor is None:
+        _bulk_executor = process_executor(BULK_IMPORT_WORKERS)
+    return _bulk_executor
+
+def shutdown_bulk_executor():
+    global _bulk_executor
+    if _bulk_executor is not None:
+        _bulk_executor.shutdown(wait=False, cancel_futures=True)
+        _bulk_executor = None
+
+async def iter_lines(chunks):
+    """Split an async stream of byte chunks into decoded lines."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+async def iter_user_rows(lines, input_format: str):
+    """Yield (row number, record, error) for each non-blank CSV or NDJSON data row.
+
+    CSV input needs a header line naming the UserCreate fields; quoted values may
+    not span lines.
+    """
+    header = None
+    row = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        if input_format == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row += 1
+            yield row, dict(zip(header, values)), None
+        else:
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield row, None, "Expected a JSON object"
+                continue
+            yield row, record, None
+
+def _record_import_failure(report: BulkImportReport, row: int, username: Optional[str], error: str):
+    report.failed += 1
+    if len(report.errors) < BULK_IMPORT_MAX_ERRORS:
+        report.errors.append(BulkImportError(row=row, username=username, error=error))
+
+async def _insert_user_batch(batch, report: BulkImportReport):
+    loop = asyncio.get_running_loop()
+    executor = get_bulk_executor()
+    passwords = [user_data.password for _, user_data in batch]
+    chunk_size = max(1, math.ceil(len(passwords) / BULK_IMPORT_WORKERS))
+    hashed_chunks = await asyncio.gather(*(
+        loop.run_in_executor(executor, hash_passwords, passwords[i:i + chunk_size], hashing_policy.rounds)
+        for i in range(0, len(passwords), chunk_size)
+    ))
+    hashed_passwords = [hashed for chunk in hashed_chunks for hashed in chunk]
+    docs = [
+        User(
+            username=user_data.username,
+            email=user_data.email,
+            full_name=user_data.full_name,
+            hashed_password=hashed_password,
+        ).model_dump()
+        for (_, user_data), hashed_password in zip(batch, hashed_passwords)
+    ]
+    try:
+        result = await db.users.insert_many(docs, ordered=False)
+        report.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        report.inserted += e.details.get("nInserted", 0)
+        for write_error in e.details.get("writeErrors", []):
+            row, user_data = batch[write_error["index"]]
+            if write_error.get("code") == 11000:
+                message = "Username already registered"
+            else:
+                message = write_error.get("errmsg", "Write failed")
+            _record_import_failure(report, row, user_data.username, message)
+
+async def provision_users(rows) -> BulkImportReport:
+    """Validate, hash and insert users from iter_user_rows, batch by batch."""
+    report = BulkImportReport()
+    batch = []
+    async for row, record, error in rows:
+        report.total += 1
+        if error is not None:
+            _record_import_failure(report, row, None, error)
+            continue
+        try:
+            user_data = UserCreate(**record)
+        except ValidationError as e:
+            problems = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            _record_import_failure(report, row, record.get("username"), problems)
+            continue
+        batch.append((row, user_data))
+        if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+            await _insert_user_batch(batch, report)
+            batch = []
+    if batch:
+        await _insert_user_batch(batch, report)
+    return report
+
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
+def new_refresh_token() -> str:
+    return base64.urlsafe_b64encode(os.urandom(32)).decode('ascii').rstrip("=")
+
+async def create_session(user: User) -> tuple:
+    """Store a new session and return (session id, refresh token); only the token's hash is kept."""
+    refresh_token = new_refresh_token()
+    now = datetime.utcnow()
+    session = {
+        "id": uuid.uuid4().hex,
+        "username": user.username,
+        "user_id": user.id,
+        "token_hash": hash_refresh_token(refresh_token),
+        "previous_token_hash": None,
+        "created_at": now,
+        "rotated_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "revoked": False,
+    }
+    await db_breaker.call(lambda: db.sessions.insert_one(session))
+    return session["id"], refresh_token
+
+async def rotate_session(refresh_token: str) -> tuple:
+    """Swap a valid refresh token for a new one; return (session, new refresh token)."""
+    token_hash = hash_refresh_token(refresh_token)
+    new_token = new_refresh_token()
+    now = datetime.utcnow()
+    session = await db_breaker.call(lambda: db.sessions.find_one_and_update(
+        {"token_hash": token_hash, "revoked": False, "expires_at": {"$gt": now}},
+        {"$set": {
+            "token_hash": hash_refresh_token(new_token),
+            "previous_token_hash": token_hash,
+            "rotated_at": now,
+        }},
+    ))
+    if session is not None:
+        return session, new_token
+
+    reused = await db_breaker.call(
+        lambda: db.sessions.find_one({"previous_token_hash": token_hash, "revoked": False})
+    )
+    if reused is not None and now - reused["rotated_at"] > timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+        # An old token came back after its successor was issued: assume it leaked
+        await revoke_session(reused["id"])
+        logger.warning("Refresh token reuse detected for %s, session %s revoked", reused["username"], reused["id"])
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def revoke_session(session_id: str):
+    await db_breaker.call(lambda: db.sessions.update_one({"id": session_id}, {"$set": {"revoked": True}}))
+
+async def revoke_user_sessions(username: str):
+    await db_breaker.call(
+        lambda: db.sessions.update_many({"username": username, "revoked": False}, {"$set": {"revoked": True}})
+    )
+
+def session_token_response(user: User, session_id: str, refresh_token: str) -> Response:
+    access_token = create_access_token(data={
+        "sub": user.username,
+        "uid": user.id,
+        "sid": session_id,
+        "active": user.is_active,
+    })
+    return model_response(Token(
+        access_token=access_token,
+        token_type="bearer",
+        user=UserResponse.model_validate(user, from_attributes=True),
+        refresh_token=refresh_token,
+        expires_in=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    ))
+
+EVENT_TICKET_AUDIENCE = "portal-events"
+
+def issue_event_ticket(claims: dict) -> EventTicket:
+    """Short-lived credential for the event stream, which EventSource can only pass in the URL.
+
+    It keeps the access token's jti and iat so that logging out or revoking the user
+    also ends streams opened with it, and its audience keeps it from being usable as
+    a bearer token.
+    """
+    ticket = jwt.encode(
+        {
+            "sub": claims["sub"],
+            "sid": claims.get("sid"),
+            "jti": claims.get("jti"),
+            "iat": claims.get("iat"),
+            "aud": EVENT_TICKET_AUDIENCE,
+            "exp": int(time.time()) + SSE_TICKET_TTL_SECONDS,
+        },
+        JWT_SECRET,
+        algorithm=JWT_ALGORITHM,
+    )
+    return EventTicket(ticket=ticket, expires_in=SSE_TICKET_TTL_SECONDS)
+
+def sse_frame(event: str, data) -> bytes:
+    return b"event: " + event.encode("ascii") + b"\ndata: " + dumps_json(data) + b"\n\n"
+
+async def stream_events(claims: dict, user: User, app_ids: frozenset):
+    """Server-sent events for one client, filtered to the applications its user may see.
+
+    The caller resolves ``app_ids`` before the response starts, so that a database
+    outage still gets a 503. Once the headers are sent, an outage ends the stream
+    instead and the client reconnects after the advertised retry delay.
+    """
+    subscription = event_broadcaster.subscribe()
+    deadline = time.monotonic() + SSE_MAX_STREAM_SECONDS
+
+    def catalog_frame(changed, removed):
+        changed = [
+            application_payload(application_catalog.by_id[app_id])
+            for app_id in changed if app_id in application_catalog.by_id
+        ]
+        removed = list(removed)
+        return sse_frame("catalog", {"changed": changed, "removed": removed}) if changed or removed else None
+
+    async def entitlement_frame():
+        nonlocal app_ids
+        previous, app_ids = app_ids, await entitlement_index.app_ids(user)
+        return catalog_frame(app_ids - previous, previous - app_ids)
+
+    try:
+        yield b"retry: 5000\n\n"
+        # Picks up grants changed before the subscription existed; a cache hit otherwise
+        app_ids = await entitlement_index.app_ids(user)
+        while True:
+            timeout = min(SSE_HEARTBEAT_SECONDS, deadline - time.monotonic())
+            if timeout <= 0 or revocations.is_revoked(claims):
+                break
+            try:
+                kind, payload = await asyncio.wait_for(subscription.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+
+            if subscription.lagged:
+                # Events were dropped for this client; it reloads the catalog instead
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.lagged = False
+                app_ids = await entitlement_index.app_ids(user)
+                yield sse_frame("resync", {})
+                continue
+
+            frame = None
+            if kind == "catalog":
+                frame = catalog_frame(
+                    [app_id for app_id in payload["changed"] if app_id in app_ids],
+                    [app_id for app_id in payload["removed"] if app_id in app_ids],
+                )
+            elif kind == "status":
+                statuses = {app_id: value for app_id, value in payload["statuses"].items() if app_id in app_ids}
+                frame = sse_frame("status", {"statuses": statuses}) if statuses else None
+            elif kind == "entitlements":
+                affected = (
+                    payload["principal_id"] == user.id if payload["principal_type"] == "user"
+                    else payload["principal_id"] in entitlement_index.groups_of(user)
+                )
+                if affected:
+                    frame = await entitlement_frame()
+            elif kind == "user" and payload["username"] == user.username:
+                user = await load_user(user.username)
+                if user is None or not user.is_active:
+                    break
+                frame = await entitlement_frame()
+            if frame is not None:
+                yield frame
+    except DatabaseUnavailable as e:
+        logger.info("Ending event stream for %s: %s", user.username, e.detail)
+    finally:
+        event_broadcaster.unsubscribe(subscription)
 
 # Routes
 @api_router.post("/register", response_model=UserResponse)
 async def register(user_data: UserCreate):
-    # Check if user already exists
-    existing_user = await db.users.find_one({"username": user_data.username})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered"
-        )
-    
-    # Create new user
-    hashed_password = hash_password(user_data.password)
+    # Create new user; the unique username index rejects duplicates
+    hashed_password = await password_pool.run(hash_password, user_data.password, hashing_policy.rounds)
     user = User(
         username=user_data.username,
         email=user_data.email,
@@ -136,186 +2832,373 @@ async def register(user_data: UserCreate):
         hashed_password=hashed_password
     )
     
-    await db.users.insert_one(user.dict())
-    return UserResponse(**user.dict())
+    try:
+        await db_breaker.call(lambda: db.users.insert_one(user.model_dump()))
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered"
+        )
+    return model_response(UserResponse.model_validate(user, from_attributes=True))
 
 @api_router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin):
-    user = await db.users.find_one({"username": user_credentials.username})
-    if not user or not verify_password(user_credentials.password, user["hashed_password"]):
+async def login(user_credentials: UserLogin, request: Request):
+    audit_fields = {
+        "username": user_credentials.username,
+        "ip": client_ip(request),
+        "user_agent": request.headers.get("user-agent"),
+    }
+    if LOGIN_RATE_LIMIT_ENABLED:
+        try:
+            await login_rate_limiter.check(audit_fields["ip"], user_credentials.username)
+        except HTTPException:
+            audit_log.record("login", outcome="rate_limited", **audit_fields)
+            raise
+    # Fails fast with 503 while the breaker is open rather than queueing behind Mongo
+    user = await db_breaker.call(lambda: db.users.find_one({"username": user_credentials.username}))
+    if not user or not await password_pool.run(verify_password, user_credentials.password, user["hashed_password"]):
+        audit_log.record("login", outcome="invalid_credentials", **audit_fields)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if not user.get("is_active", True):
+        audit_log.record("login", outcome="inactive", user_id=user.get("id"), **audit_fields)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if hashing_policy.needs_rehash(user["hashed_password"]):
+        spawn_background(rehash_password(user["username"], user_credentials.password, user["hashed_password"]))
     
-    access_token = create_access_token(data={"sub": user["username"]})
-    user_response = UserResponse(**user)
-    
-    return Token(
-        access_token=access_token,
-        token_type="bearer",
-        user=user_response
-    )
+    user = User(**user)
+    session_id, refresh_token = await create_session(user)
+    audit_log.record("login", outcome="success", user_id=user.id, session_id=session_id, **audit_fields)
+    return session_token_response(user, session_id, refresh_token)
+
+@api_router.post("/refresh", response_model=Token)
+async def refresh(refresh_request: RefreshRequest):
+    session, refresh_token = await rotate_session(refresh_request.refresh_token)
+    user = await load_user(session["username"])
+    if user is None or not user.is_active:
+        await revoke_session(session["id"])
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return session_token_response(user, session["id"], refresh_token)
+
+@api_router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(claims: dict = Depends(get_token_claims)):
+    if claims.get("jti"):
+        shared_state.publish("revoke_token", {"jti": claims["jti"], "exp": claims["exp"]})
+    if claims.get("sid"):
+        await revoke_session(claims["sid"])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @api_router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    return UserResponse(**current_user.dict())
-
-@api_router.get("/applications", response_model=List[Application])
-async def get_applications(current_user: User = Depends(get_current_user)):
-    # Mock data for applications
-    mock_applications = [
-        # Native secure applications
-        Application(
-            id="app1",
-            name="WordPress",
-            description="Plateforme de gestion de contenu",
-            icon="🌐",
-            category="native",
-            url="https://wordpress.example.com"
-        ),
-        Application(
-            id="app2",
-            name="Odoo ERP",
-            description="Système de gestion d'entreprise",
-            icon="📊",
-            category="native",
-            url="https://odoo.example.com"
-        ),
-        Application(
-            id="app3",
-            name="Nextcloud",
-            description="Stockage et collaboration cloud",
-            icon="☁️",
-            category="native",
-            url="https://nextcloud.example.com"
-        ),
-        Application(
-            id="app4",
-            name="GitLab CE",
-            description="Plateforme DevOps intégrée",
-            icon="🔧",
-            category="native",
-            url="https://gitlab.example.com"
-        ),
-        Application(
-            id="app5",
-            name="Jira",
-            description="Gestion de projets Agile",
-            icon="📋",
-            category="native",
-            url="https://jira.example.com"
-        ),
-        Application(
-            id="app6",
-            name="Confluence",
-            description="Espace de travail collaboratif",
-            icon="📝",
-            category="native",
-            url="https://confluence.example.com"
-        ),
-        Application(
-            id="app7",
-            name="Mattermost",
-            description="Communication d'équipe sécurisée",
-            icon="💬",
-            category="native",
-            url="https://mattermost.example.com"
-        ),
-        Application(
-            id="app8",
-            name="Grafana",
-            description="Monitoring et visualisation",
-            icon="📈",
-            category="native",
-            url="https://grafana.example.com"
-        ),
-        # Portal secured applications
-        Application(
-            id="portal1",
-            name="Analytics Pro",
-            description="Analyse avancée des données",
-            icon="📊",
-            category="portal"
-        ),
-        Application(
-            id="portal2",
-            name="CRM Manager",
-            description="Gestion de la relation client",
-            icon="👥",
-            category="portal"
-        ),
-        Application(
-            id="portal3",
-            name="Invoice System",
-            description="Système de facturation",
-            icon="💰",
-            category="portal"
-        ),
-        Application(
-            id="portal4",
-            name="Document Hub",
-            description="Centre de documentation",
-            icon="📁",
-            category="portal"
-        ),
-        Application(
-            id="portal5",
-            name="Task Tracker",
-            description="Suivi des tâches et projets",
-            icon="✅",
-            category="portal"
-        ),
-        Application(
-            id="portal6",
-            name="Report Builder",
-            description="Générateur de rapports",
-            icon="📄",
-            category="portal"
-        ),
-        Application(
-            id="portal7",
-            name="Security Center",
-            description="Centre de sécurité",
-            icon="🔐",
-            category="portal"
-        ),
-        Application(
-            id="portal8",
-            name="API Gateway",
-            description="Passerelle d'API",
-            icon="🔗",
-            category="portal"
+async def get_current_user_info(request: Request, current_user: User = Depends(get_current_user)):
+    etag = user_etag(current_user)
+    if etag_matches(request, etag):
+        return not_modified_response(etag)
+    body = UserResponse.model_validate(current_user, from_attributes=True).model_dump_json().encode("utf-8")
+    return cached_response(request, body, etag)
+
+@api_router.post("/admin/users/import", response_model=BulkImportReport)
+async def import_users(
+    request: Request,
+    input_format: Optional[str] = Query(None, alias="format"),
+    admin: User = Depends(get_current_admin),
+):
+    if input_format is None:
+        input_format = "ndjson" if "json" in request.headers.get("content-type", "") else "csv"
+    if input_format not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be csv or ndjson"
         )
-    ]
-    
-    return mock_applications
+    try:
+        report = await provision_users(iter_user_rows(iter_lines(request.stream()), input_format))
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Input must be UTF-8 encoded"
+        )
+    logger.info(
+        "Bulk import by %s: %d rows, %d inserted, %d failed",
+        admin.username, report.total, report.inserted, report.failed,
+    )
+    return model_response(report)
+
+@api_router.get("/applications", response_model=List[ApplicationWithStatus])
+async def get_applications(
+    request: Request,
+    category: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    if not (category or q or limit or cursor or fields):
+        body, etag = await entitlement_index.catalog(current_user)
+        return cached_response(request, body, etag)
+
+    app_ids = await entitlement_index.app_ids(current_user)
+    docs, next_cursor = await query_applications(app_ids, category, q, limit, cursor, parse_fields(fields))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    body = dumps_json(docs)
+    return cached_response(request, body, f'"{hashlib.sha256(body).hexdigest()[:32]}"', headers)
+
+@api_router.post("/applications/access-tokens", response_model=AppAccessTokenBatch)
+async def generate_access_tokens(
+    batch: AppAccessTokenBatchRequest,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+):
+    if len(batch.app_ids) > APP_TOKEN_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {APP_TOKEN_BATCH_MAX} applications per batch"
+        )
+    entitled = await entitlement_index.app_ids(current_user)
+    tokens = []
+    unknown_app_ids = []
+    for app_id in dict.fromkeys(batch.app_ids):
+        if app_id in application_catalog.by_id and app_id in entitled:
+            tokens.append(issue_app_token(current_user, app_id))
+        else:
+            unknown_app_ids.append(app_id)
+    audit_log.record(
+        "app_access_tokens",
+        username=current_user.username,
+        user_id=current_user.id,
+        ip=client_ip(request),
+        app_ids=[token.app_id for token in tokens],
+        denied_app_ids=unknown_app_ids,
+    )
+    return model_response(AppAccessTokenBatch(tokens=tokens, unknown_app_ids=unknown_app_ids))
+
+@api_router.post("/applications/{app_id}/access-token", response_model=AppAccessToken)
+async def generate_access_token(app_id: str, request: Request, current_user: User = Depends(get_current_user)):
+    audit_fields = {
+        "username": current_user.username,
+        "user_id": current_user.id,
+        "ip": client_ip(request),
+        "app_id": app_id,
+    }
+    if app_id not in application_catalog.by_id or app_id not in await entitlement_index.app_ids(current_user):
+        audit_log.record("app_access_token", outcome="denied", **audit_fields)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Application not found"
+        )
+    audit_log.record("app_access_token", outcome="issued", **audit_fields)
+    return model_response(issue_app_token(current_user, app_id))
+
+@api_router.get("/admin/users", response_model=List[UserResponse])
+async def list_users(
+    q: Optional[str] = None,
+    username: Optional[str] = None,
+    email: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    admin: User = Depends(get_current_admin),
+):
+    users, next_cursor = await query_users(q, username, email, is_active, limit, cursor)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=user_list_adapter.dump_json(users), media_type="application/json", headers=headers)
+
+async def get_user_or_404(username: str) -> User:
+    user = await load_user(username)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
+
+@api_router.patch("/admin/users/{username}", response_model=UserResponse)
+async def patch_user(username: str, update: UserUpdate, admin: User = Depends(get_current_admin)):
+    user = await get_user_or_404(username)
+    changes = update.model_dump(exclude_none=True)
+    if changes.get("is_active") is False and user.is_active:
+        # Also revokes the user's access tokens and refresh sessions
+        await deactivate_user(username)
+    if changes and not await update_user(username, changes):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    user = await get_user_or_404(username)
+    return model_response(UserResponse.model_validate(user, from_attributes=True))
+
+def ensure_application_exists(app_id: str):
+    if app_id not in application_catalog.by_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Application not found"
+        )
+
+@api_router.put("/admin/applications/{app_id}", response_model=Application)
+async def put_application(app_id: str, application_input: ApplicationInput, admin: User = Depends(get_current_admin)):
+    application = Application(id=app_id, **application_input.model_dump())
+    await save_application(application)
+    return model_response(application)
+
+@api_router.delete("/admin/applications/{app_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_application(app_id: str, admin: User = Depends(get_current_admin)):
+    if not await delete_application(app_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Application not found"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@api_router.put("/admin/users/{username}/applications/{app_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def grant_user_application(username: str, app_id: str, admin: User = Depends(get_current_admin)):
+    ensure_application_exists(app_id)
+    user = await get_user_or_404(username)
+    await set_entitlement("user", user.id, app_id, True)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
-@api_router.post("/applications/{app_id}/access-token")
-async def generate_access_token(app_id: str, current_user: User = Depends(get_current_user)):
-    # For this MVP, we'll return a mock token
-    mock_token = f"portal_token_{app_id}_{current_user.id}_{int(datetime.utcnow().timestamp())}"
-    return {"access_token": mock_token, "app_id": app_id}
+@api_router.delete("/admin/users/{username}/applications/{app_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_user_application(username: str, app_id: str, admin: User = Depends(get_current_admin)):
+    user = await get_user_or_404(username)
+    await set_entitlement("user", user.id, app_id, False)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@api_router.put("/admin/groups/{group_id}/applications/{app_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def grant_group_application(group_id: str, app_id: str, admin: User = Depends(get_current_admin)):
+    ensure_application_exists(app_id)
+    await set_entitlement("group", group_id, app_id, True)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@api_router.delete("/admin/groups/{group_id}/applications/{app_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_group_application(group_id: str, app_id: str, admin: User = Depends(get_current_admin)):
+    await set_entitlement("group", group_id, app_id, False)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@api_router.put("/admin/groups/{group_id}/members/{username}", status_code=status.HTTP_204_NO_CONTENT)
+async def add_group_member(group_id: str, username: str, admin: User = Depends(get_current_admin)):
+    if not await set_group_membership(username, group_id, True):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@api_router.delete("/admin/groups/{group_id}/members/{username}", status_code=status.HTTP_204_NO_CONTENT)
+async def remove_group_member(group_id: str, username: str, admin: User = Depends(get_current_admin)):
+    if not await set_group_membership(username, group_id, False):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@api_router.post("/events/ticket", response_model=EventTicket)
+async def create_event_ticket(
+    claims: dict = Depends(get_token_claims),
+    current_user: User = Depends(get_current_user),
+):
+    return model_response(issue_event_ticket(claims))
+
+@api_router.get("/events/stream")
+async def event_stream(ticket: str):
+    try:
+        claims = jwt.decode(ticket, JWT_SECRET, algorithms=[JWT_ALGORITHM], audience=EVENT_TICKET_AUDIENCE)
+    except jwt.PyJWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired ticket"
+        )
+    user = await load_user(claims["sub"])
+    if user is None or not user.is_active or revocations.is_revoked(claims):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired ticket"
+        )
+    if event_broadcaster.full():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many event streams",
+            headers={"Retry-After": "30"},
+        )
+    app_ids = await entitlement_index.app_ids(user)
+    return StreamingResponse(
+        stream_events(claims, user, app_ids),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # Include the router in the main app
 app.include_router(api_router)
 
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        interval=PROFILE_SAMPLE_INTERVAL_MS / 1000,
+        max_seconds=PROFILE_MAX_SECONDS,
+    )
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Profile-Status", "X-Profile-Samples", "X-Profile-Duration-Ms"],
 )
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MINIMUM_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
+    cache_size=COMPRESSION_CACHE_MAX_SIZE,
 )
-logger = logging.getLogger(__name__)
+app.add_middleware(MetricsMiddleware)
+
+def _stats_gauge(name: str, documentation: str, source, keys):
+    metrics.register(Gauge(
+        name, documentation, ("stat",),
+        callback=lambda: {(key,): source.stats()[key] for key in keys},
+    ))
+
+_stats_gauge("portal_password_pool", "Password pool state", password_pool,
+             ("in_flight", "submitted", "rejected"))
+_stats_gauge("portal_user_cache", "Authenticated user cache state", user_cache,
+             ("size", "hits", "misses", "evictions"))
+_stats_gauge("portal_db_breaker", "Mongo circuit breaker state and totals", db_breaker,
+             ("open", "half_open", "consecutive_failures", "opened", "rejected", "timeouts"))
+_stats_gauge("portal_login_rate_limiter", "Login rate limiter bucket store", login_rate_limiter,
+             ("keys", "evictions"))
+_stats_gauge("portal_shared_state_events", "Shared state events published, received and replayed", shared_state,
+             ("published", "received", "replayed"))
+_stats_gauge("portal_entitlement_cache", "Materialized per-user application lists", entitlement_index,
+             ("users", "groups", "bodies", "generations", "hits", "misses"))
+_stats_gauge("portal_application_health", "Applications by last probe result", health_prober,
+             ("up", "down"))
+_stats_gauge("portal_event_streams", "Live event streams and fan-out", event_broadcaster,
+             ("clients", "published", "dropped"))
+_stats_gauge("portal_audit_log", "Audit pipeline queue and write totals", audit_log,
+             ("queued", "written", "dropped", "spilled"))
+_stats_gauge("portal_mongo_pool", "MongoDB connection pool checkouts", pool_monitor,
+             ("checkouts", "failures", "connections_created", "wait_seconds_avg", "wait_seconds_max"))
+metrics.register(Gauge(
+    "portal_index_ready", "1 if the startup build of the index succeeded, 0 if it failed", ("index",),
+    callback=lambda: {(index,): int(result["ready"]) for index, result in index_status.items()},
+))
+
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    return {"status": "ok"}
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness():
+    """200 once startup warmup has finished, 503 with its progress until then."""
+    return JSONResponse(
+        startup.status(),
+        status_code=status.HTTP_200_OK if startup.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the backend
+Imports server in a fresh interpreter with `-X importtime` and reports how long the
+import takes and which of its direct imports the time goes to
+
+    python startup_profile.py
+    python startup_profile.py --top 30 --budget-ms 600
+
+With --budget-ms, exits with status 1 when the import takes longer than the budget,
+so the check can run in CI.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def profile_import(module: str) -> list:
+    """(self_us, cumulative_us, depth, name) for every module imported by `module`"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "portal_profile")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(self_us), int(cumulative_us), (len(indent) - 1) // 2, name))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the import time of the backend")
+    parser.add_argument("--module", default="server", help="Module to import (default: server)")
+    parser.add_argument("--top", type=int, default=20, help="How many direct imports to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail when the import takes longer than this")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    entries = profile_import(args.module)
+    # -X importtime lists children before their parent, so the module's own line comes last
+    index = max(i for i, entry in enumerate(entries) if entry[2] == 0 and entry[3] == args.module)
+    self_us, total_us, _, _ = entries[index]
+    start = index
+    while start > 0 and entries[start - 1][2] > 0:
+        start -= 1
+    direct = sorted(
+        (entry for entry in entries[start:index] if entry[2] == 1),
+        key=lambda entry: entry[1],
+        reverse=True,
+    )
+
+    report = {
+        "module": args.module,
+        "total_ms": round(total_us / 1000, 1),
+        "self_ms": round(self_us / 1000, 1),
+        "imports": [{"name": name, "cumulative_ms": round(cumulative / 1000, 1)}
+                    for _, cumulative, _, name in direct[:args.top]],
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import {args.module}: {report['total_ms']} ms ({report['self_ms']} ms in the module body)")
+        for item in report["imports"]:
+            print(f"  {item['cumulative_ms']:>8} ms  {item['name']}")
+
+    if args.budget_ms is not None and report["total_ms"] > args.budget_ms:
+        print(f"Import time {report['total_ms']} ms exceeds the {args.budget_ms} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
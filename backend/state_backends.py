@@ -0,0 +1,412 @@
+"""
+State shared between the portal's worker processes
+
+Token revocations, user cache invalidations and login rate limit buckets have to
+agree across workers. Handlers subscribe to named channels; published events are
+applied in the publishing process at once and forwarded to the other workers by
+the file (SQLite) or Redis backend. The base class is the single-process backend.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Strong references to in-flight forwards so they are not garbage collected
+_forwarding = set()
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _forwarding.add(task)
+    task.add_done_callback(_forwarding.discard)
+    return task
+
+class RateLimitBackend:
+    """Token bucket storage. Implementations may keep buckets locally or share them between workers."""
+
+    async def take(self, key: str, rate: float, capacity: float) -> float:
+        """Consume one token from ``key``; return 0 when allowed, else seconds until a token is free."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-process buckets, bounded by evicting the least recently used keys."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max(1, max_keys)
+        self._buckets = OrderedDict()  # key -> (tokens, last refill time)
+        self.evictions = 0
+
+    async def take(self, key: str, rate: float, capacity: float) -> float:
+        now = time.monotonic()
+        tokens, refilled_at = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - refilled_at) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+        else:
+            retry_after = (1 - tokens) / rate if rate > 0 else float("inf")
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        return {"keys": len(self._buckets), "max_keys": self.max_keys, "evictions": self.evictions}
+
+class SharedStateBackend:
+    """Keeps per-process state consistent across workers.
+
+    Events published on a channel are applied to this process immediately and
+    forwarded to the other workers, which apply them through the same handlers.
+    This base class is the single-process implementation: nothing is forwarded
+    and rate limit buckets stay in memory.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        self._handlers = {}
+        self._retention = {}  # channel -> seconds a starting worker must replay
+        self.published = 0
+        self.received = 0
+        self.replayed = 0
+
+    def subscribe(self, channel: str, handler, retain_seconds: float = 0):
+        """Call ``handler`` for every event on ``channel``.
+
+        With ``retain_seconds``, events stay available that long and a worker that
+        starts (or restarts) later replays them, so state such as token revocations
+        is not lost with the process that heard them.
+        """
+        self._handlers.setdefault(channel, []).append(handler)
+        if retain_seconds > 0:
+            self._retention[channel] = max(self._retention.get(channel, 0), retain_seconds)
+
+    def _dispatch(self, channel: str, payload: dict):
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Shared state handler for %s failed", channel)
+
+    def publish(self, channel: str, payload: dict):
+        self.published += 1
+        self._dispatch(channel, payload)
+        self._forward(channel, payload)
+
+    def _forward(self, channel: str, payload: dict):
+        pass
+
+    def _receive(self, channel: str, payload: dict):
+        self.received += 1
+        self._dispatch(channel, payload)
+
+    def _replay(self, channel: str, payload: dict):
+        self.replayed += 1
+        self._dispatch(channel, payload)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def rate_limit_backend(self, max_keys: int) -> RateLimitBackend:
+        return MemoryRateLimitBackend(max_keys)
+
+    def stats(self) -> dict:
+        return {"published": self.published, "received": self.received, "replayed": self.replayed}
+
+class FileStateBackend(SharedStateBackend):
+    """Shares events and rate limit buckets through a SQLite file, by default on /dev/shm.
+
+    Suited to several workers on one host; other workers see events within
+    SHARED_STATE_POLL_SECONDS.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str, poll_seconds: float):
+        super().__init__()
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_event_id = 0
+        self._poll_task = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, payload TEXT, origin TEXT, created_at REAL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated_at REAL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS buckets_updated_at ON buckets (updated_at)")
+        # Bucket count and evictions, kept up to date so that bounding the table never has to count it
+        conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+        conn.execute("INSERT OR IGNORE INTO counters VALUES ('buckets', (SELECT COUNT(*) FROM buckets))")
+        conn.execute("INSERT OR IGNORE INTO counters VALUES ('evictions', 0)")
+        return conn
+
+    def _execute(self, func, *args):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            return func(self._conn, *args)
+
+    def _read_retained(self, conn):
+        """Latest event id, plus the events on retained channels still within their retention."""
+        last_id = conn.execute("SELECT MAX(id) FROM events").fetchone()[0] or 0
+        now = time.time()
+        rows = []
+        for channel, seconds in self._retention.items():
+            rows += conn.execute(
+                "SELECT id, channel, payload FROM events WHERE channel = ? AND id <= ? AND created_at >= ?",
+                (channel, last_id, now - seconds),
+            ).fetchall()
+        return last_id, sorted(rows)
+
+    async def start(self):
+        self._last_event_id, rows = await asyncio.to_thread(self._execute, self._read_retained)
+        for _, channel, payload in rows:
+            self._replay(channel, json.loads(payload))
+        self._poll_task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _insert_event(conn, channel, payload, origin):
+        conn.execute(
+            "INSERT INTO events (channel, payload, origin, created_at) VALUES (?, ?, ?, ?)",
+            (channel, json.dumps(payload), origin, time.time()),
+        )
+
+    def _forward(self, channel: str, payload: dict):
+        _spawn(asyncio.to_thread(self._execute, self._insert_event, channel, payload, self.origin))
+
+    @staticmethod
+    def _read_events(conn, last_id):
+        return conn.execute(
+            "SELECT id, channel, payload, origin FROM events WHERE id > ? ORDER BY id", (last_id,)
+        ).fetchall()
+
+    def _prune(self, conn):
+        # Events outlive the poll interval and any channel's retention; idle buckets have refilled long ago
+        cutoff = time.time() - 3600
+        conn.execute("DELETE FROM events WHERE created_at < ?", (cutoff - max(self._retention.values(), default=0),))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            deleted = conn.execute("DELETE FROM buckets WHERE updated_at < ?", (cutoff,)).rowcount
+            conn.execute("UPDATE counters SET value = value - ? WHERE name = 'buckets'", (deleted,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def _poll_loop(self):
+        next_prune = time.monotonic() + 60
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                rows = await asyncio.to_thread(self._execute, self._read_events, self._last_event_id)
+                if time.monotonic() >= next_prune:
+                    next_prune = time.monotonic() + 60
+                    await asyncio.to_thread(self._execute, self._prune)
+            except sqlite3.Error:
+                logger.exception("Failed to read shared state events")
+                continue
+            for event_id, channel, payload, origin in rows:
+                self._last_event_id = event_id
+                if origin != self.origin:
+                    self._receive(channel, json.loads(payload))
+
+    @staticmethod
+    def _take_token(conn, key, rate, capacity, max_keys):
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / rate if rate > 0 else float("inf")
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                (key, tokens, now),
+            )
+            if row is None:
+                conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'buckets'")
+            keys = conn.execute("SELECT value FROM counters WHERE name = 'buckets'").fetchone()[0]
+            if keys > max_keys:
+                # Evict the least recently used buckets, as the in-memory backend does
+                evicted = conn.execute(
+                    "DELETE FROM buckets WHERE key IN (SELECT key FROM buckets ORDER BY updated_at, rowid LIMIT ?)",
+                    (keys - max_keys,),
+                ).rowcount
+                keys -= evicted
+                conn.execute("UPDATE counters SET value = ? WHERE name = 'buckets'", (keys,))
+                conn.execute("UPDATE counters SET value = value + ? WHERE name = 'evictions'", (evicted,))
+            evictions = conn.execute("SELECT value FROM counters WHERE name = 'evictions'").fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after, keys, evictions
+
+    def rate_limit_backend(self, max_keys: int) -> RateLimitBackend:
+        return SharedRateLimitBackend(self, max_keys)
+
+    async def take_token(self, key: str, rate: float, capacity: float, max_keys: int) -> tuple:
+        """Consume a token; return (retry after, bucket count, evictions so far) across all workers."""
+        return await asyncio.to_thread(self._execute, self._take_token, key, rate, capacity, max_keys)
+
+# KEYS: bucket hash, sorted set of bucket keys by last use, eviction counter
+REDIS_TOKEN_BUCKET_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local max_keys = tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+elseif rate > 0 then
+    retry = (1 - tokens) / rate
+else
+    retry = 3600
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+if rate > 0 then
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+end
+redis.call('ZADD', KEYS[2], now, KEYS[1])
+-- Buckets idle for an hour have expired on their own
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - 3600)
+local keys = redis.call('ZCARD', KEYS[2])
+if keys > max_keys then
+    local oldest = redis.call('ZRANGE', KEYS[2], 0, keys - max_keys - 1)
+    redis.call('DEL', unpack(oldest))
+    redis.call('ZREM', KEYS[2], unpack(oldest))
+    redis.call('INCRBY', KEYS[3], #oldest)
+    keys = keys - #oldest
+end
+return {tostring(retry), keys, tonumber(redis.call('GET', KEYS[3]) or 0)}
+"""
+
+class RedisStateBackend(SharedStateBackend):
+    """Shares events over Redis pub/sub and keeps rate limit buckets in Redis hashes.
+
+    Pub/sub has no history, so events on retained channels are also written to
+    keys that expire with the retention; starting workers replay those keys.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str):
+        super().__init__()
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError:
+            raise RuntimeError("SHARED_STATE_BACKEND=redis requires the 'redis' package")
+        self.prefix = prefix
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._redis = redis_asyncio.from_url(url)
+        self._bucket_script = self._redis.register_script(REDIS_TOKEN_BUCKET_SCRIPT)
+        self._pubsub = None
+        self._listen_task = None
+
+    async def start(self):
+        self._pubsub = self._redis.pubsub()
+        # Subscribe first so nothing published during the replay is missed; replaying twice is harmless
+        await self._pubsub.subscribe(self.prefix + "events")
+        keys = [key async for key in self._redis.scan_iter(match=self.prefix + "retained:*", count=1000)]
+        for start in range(0, len(keys), 1000):
+            for value in await self._redis.mget(keys[start:start + 1000]):
+                if value is not None:
+                    event = json.loads(value)
+                    self._replay(event["channel"], event["payload"])
+        self._listen_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        await self._redis.aclose()
+
+    async def _listen(self):
+        async for message in self._pubsub.listen():
+            if message["type"] != "message":
+                continue
+            event = json.loads(message["data"])
+            if event["origin"] != self.origin:
+                self._receive(event["channel"], event["payload"])
+
+    def _forward(self, channel: str, payload: dict):
+        event = json.dumps({"channel": channel, "payload": payload, "origin": self.origin})
+        retain_seconds = self._retention.get(channel)
+        if retain_seconds:
+            key = f"{self.prefix}retained:{channel}:{uuid.uuid4().hex}"
+            _spawn(self._redis.set(key, event, ex=math.ceil(retain_seconds)))
+        _spawn(self._redis.publish(self.prefix + "events", event))
+
+    def rate_limit_backend(self, max_keys: int) -> RateLimitBackend:
+        return SharedRateLimitBackend(self, max_keys)
+
+    async def take_token(self, key: str, rate: float, capacity: float, max_keys: int) -> tuple:
+        """Consume a token; return (retry after, bucket count, evictions so far) across all workers."""
+        retry_after, keys, evictions = await self._bucket_script(
+            keys=[self.prefix + key, self.prefix + "buckets", self.prefix + "bucket_evictions"],
+            args=[rate, capacity, time.time(), max_keys],
+        )
+        return float(retry_after), int(keys), int(evictions)
+
+class SharedRateLimitBackend(RateLimitBackend):
+    """Rate limit buckets held by a shared state backend, so limits hold across workers.
+
+    The store evicts its least recently used buckets beyond ``max_keys``. Stats are
+    the store-wide counts returned by the latest take.
+    """
+
+    def __init__(self, state, max_keys: int):
+        self.state = state
+        self.max_keys = max(1, max_keys)
+        self.keys = 0
+        self.evictions = 0
+
+    async def take(self, key: str, rate: float, capacity: float) -> float:
+        retry_after, self.keys, self.evictions = await self.state.take_token(key, rate, capacity, self.max_keys)
+        return retry_after
+
+    def stats(self) -> dict:
+        return {"keys": self.keys, "max_keys": self.max_keys, "evictions": self.evictions}
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+SyncLogic Portal Backend Benchmarks
+Runs load scenarios against the portal API and writes latency/throughput results to JSON
+
+By default the FastAPI app is driven in-process with an in-memory Mongo stand-in
+(mongomock-motor), so results only depend on the code under test. Pass --base-url
+to benchmark a running uvicorn instead.
+
+    python backend_bench.py --output bench_results.json
+    python backend_bench.py --base-url http://localhost:8001 --concurrency 1,16,64
+
+In-process runs also measure cold start: each sample is a fresh interpreter that
+imports the backend, starts it and times its first responses. --db-latency-ms adds
+a delay to every in-memory database call, and --db-stall-ms re-runs the
+authenticated scenarios while the database hangs, to exercise the per-operation
+deadline, circuit breaker and last-known-good fallbacks.
+
+    python backend_bench.py --db-stall-ms 5000 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).parent
+BENCH_USER = {
+    "username": "bench_user",
+    "email": "bench@synclogic.com",
+    "full_name": "Bench User",
+    "password": "benchpassword123"
+}
+
+
+class DatabaseLatency:
+    """Delay added to every awaited mongomock-motor collection and cursor call once installed"""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def wrap(self, method):
+        async def delayed(*args, **kwargs):
+            if self.seconds > 0:
+                await asyncio.sleep(self.seconds)
+            return await method(*args, **kwargs)
+        return delayed
+
+    def install(self, patch=setattr):
+        """Wrap the mongomock-motor classes; tests pass monkeypatch.setattr to undo it afterwards"""
+        import inspect
+        from mongomock_motor import AsyncCursor, AsyncMongoMockCollection
+
+        for cls in (AsyncMongoMockCollection, AsyncCursor):
+            for name, method in inspect.getmembers(cls, inspect.iscoroutinefunction):
+                # Real cursors fetch in batches, so only whole-result calls pay the round trip
+                if name not in ("next", "__anext__"):
+                    patch(cls, name, self.wrap(method))
+
+
+DB_LATENCY = DatabaseLatency()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def load_app():
+    """Import the backend with its Mongo client replaced by an in-memory stand-in"""
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "portal_bench")
+    # The login storm measures hashing throughput, not the brute-force throttle
+    os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "false")
+    # Probing the seeded example URLs would only add outbound noise to the measurements
+    os.environ.setdefault("HEALTH_PROBE_ENABLED", "false")
+    # mongomock cannot create capped collections
+    os.environ.setdefault("AUDIT_COLLECTION_SIZE_BYTES", "0")
+    sys.path.insert(0, str(ROOT_DIR / "backend"))
+    from mongomock_motor import AsyncMongoMockClient
+    import server
+
+    server.create_mongo_client = lambda: AsyncMongoMockClient()
+    return server
+
+
+class BenchmarkRunner:
+    def __init__(self, client, concurrency_levels, requests_per_level, login_requests):
+        self.client = client
+        self.concurrency_levels = concurrency_levels
+        self.requests_per_level = requests_per_level
+        self.login_requests = login_requests
+        self.auth_headers = None
+        self.catalog_etag = ""
+        self.results = []
+
+    async def setup(self):
+        """Register the benchmark user (if needed) and obtain a token"""
+        await self.client.post("/api/register", json=BENCH_USER)
+        response = await self.client.post("/api/login", json={
+            "username": BENCH_USER["username"],
+            "password": BENCH_USER["password"]
+        })
+        response.raise_for_status()
+        self.auth_headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        response = await self.client.get("/api/applications", headers=self.auth_headers)
+        self.catalog_etag = response.headers.get("etag", "")
+
+    async def run_scenario(self, name, make_request, total_requests, concurrency):
+        """Issue total_requests calls with at most `concurrency` in flight"""
+        latencies = []
+        statuses = {}
+        bytes_received = 0
+        remaining = total_requests
+
+        async def worker():
+            nonlocal remaining, bytes_received
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await make_request()
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                bytes_received += response.num_bytes_downloaded
+
+        cpu_started = time.process_time()
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - wall_started
+        cpu = time.process_time() - cpu_started
+
+        latencies.sort()
+        result = {
+            "scenario": name,
+            "concurrency": concurrency,
+            "requests": total_requests,
+            "statuses": {str(code): count for code, count in sorted(statuses.items())},
+            "rps": round(total_requests / wall, 2) if wall else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "bytes_received": bytes_received,
+        }
+        self.results.append(result)
+        print(f"{name:<18} c={concurrency:<4} rps={result['rps']:<10} "
+              f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+              f"statuses={result['statuses']}")
+        return result
+
+    def scenarios(self):
+        credentials = {"username": BENCH_USER["username"], "password": BENCH_USER["password"]}
+        return {
+            "login_storm": (lambda: self.client.post("/api/login", json=credentials), self.login_requests),
+            "me_steady": (lambda: self.client.get("/api/me", headers=self.auth_headers), self.requests_per_level),
+            "catalog_fetch": (
+                lambda: self.client.get("/api/applications", headers=self.auth_headers),
+                self.requests_per_level,
+            ),
+            # Same request without compression, to measure the bytes and CPU it saves
+            "catalog_identity": (
+                lambda: self.client.get(
+                    "/api/applications",
+                    headers={**self.auth_headers, "Accept-Encoding": "identity"},
+                ),
+                self.requests_per_level,
+            ),
+            "catalog_revalidate": (
+                lambda: self.client.get(
+                    "/api/applications",
+                    headers={**self.auth_headers, "If-None-Match": self.catalog_etag},
+                ),
+                self.requests_per_level,
+            ),
+        }
+
+    async def run(self, selected):
+        await self.setup()
+        for name, (make_request, total_requests) in self.scenarios().items():
+            if selected and name not in selected:
+                continue
+            for concurrency in self.concurrency_levels:
+                await self.run_scenario(name, make_request, total_requests, concurrency)
+        return self.results
+
+
+async def cold_start_child(spawned_at):
+    """Start the backend in this fresh process and report when it first answers, in seconds since spawn"""
+    marks = {}
+    server = load_app()
+    marks["imported"] = time.time() - spawned_at
+    async with server.app.router.lifespan_context(server.app):
+        marks["listening"] = time.time() - spawned_at
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            (await client.get("/health/live")).raise_for_status()
+            marks["first_response"] = time.time() - spawned_at
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.005)
+            marks["ready"] = time.time() - spawned_at
+            await client.post("/api/register", json=BENCH_USER)
+            response = await client.post("/api/login", json={
+                "username": BENCH_USER["username"],
+                "password": BENCH_USER["password"]
+            })
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            (await client.get("/api/applications", headers=headers)).raise_for_status()
+            marks["first_catalog"] = time.time() - spawned_at
+    print(json.dumps(marks))
+
+
+async def run_db_stall(runner, server, stall_ms):
+    """Re-run the authenticated scenarios while every database call hangs for stall_ms
+
+    The fresh user and entitlement caches are dropped first so that requests have to
+    reach the database. After a few timeouts the breaker should open: sessions are
+    then served from the last-known-good caches and logins fail fast with 503.
+    """
+    scenarios = runner.scenarios()
+    baseline = DB_LATENCY.seconds
+    DB_LATENCY.seconds = stall_ms / 1000
+    server.user_cache.clear()
+    server.entitlement_index.users.clear()
+    try:
+        for name in ("me_steady", "catalog_fetch", "login_storm"):
+            make_request, total_requests = scenarios[name]
+            for concurrency in runner.concurrency_levels:
+                await runner.run_scenario(f"{name}@db_stall", make_request, total_requests, concurrency)
+    finally:
+        DB_LATENCY.seconds = baseline
+    print(f"db breaker: {server.db_breaker.stats()}")
+    return {"stall_ms": stall_ms, "breaker": server.db_breaker.stats()}
+
+
+def measure_cold_start(runs):
+    samples = []
+    for _ in range(runs):
+        spawned_at = time.time()
+        output = subprocess.check_output(
+            [sys.executable, __file__, "--cold-start-child", repr(spawned_at)], cwd=ROOT_DIR
+        )
+        samples.append(json.loads(output.decode().strip().splitlines()[-1]))
+    median = {
+        mark: round(sorted(sample[mark] for sample in samples)[len(samples) // 2], 4)
+        for mark in samples[0]
+    }
+    print("cold start (median s since spawn): " + " ".join(f"{mark}={value}" for mark, value in median.items()))
+    return {"runs": runs, "median_seconds": median, "samples": samples}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SyncLogic Portal API")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--concurrency", default="1,10,50", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario and concurrency level")
+    parser.add_argument("--login-requests", type=int, default=50, help="Requests per login storm level")
+    parser.add_argument("--scenarios", default="", help="Comma-separated subset of scenarios to run")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON report")
+    parser.add_argument("--cold-start-runs", type=int, default=3,
+                        help="Fresh-process startup samples to take (in-process mode only, 0 to skip)")
+    parser.add_argument("--db-latency-ms", type=float, default=0,
+                        help="Delay added to every database call (in-process mode only)")
+    parser.add_argument("--db-stall-ms", type=float, default=0,
+                        help="Also run the authenticated scenarios against a database that hangs this long "
+                             "(in-process mode only, 0 to skip)")
+    parser.add_argument("--cold-start-child", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start_child is not None:
+        await cold_start_child(args.cold_start_child)
+        return
+
+    concurrency_levels = [int(level) for level in args.concurrency.split(",") if level]
+    selected = {name for name in args.scenarios.split(",") if name}
+
+    cold_start = None
+    db_stall = None
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+            runner = BenchmarkRunner(client, concurrency_levels, args.requests, args.login_requests)
+            results = await runner.run(selected)
+        target = args.base_url
+    else:
+        if args.cold_start_runs > 0:
+            cold_start = measure_cold_start(args.cold_start_runs)
+        server = load_app()
+        if args.db_latency_ms > 0 or args.db_stall_ms > 0:
+            DB_LATENCY.install()
+        async with server.app.router.lifespan_context(server.app):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                runner = BenchmarkRunner(client, concurrency_levels, args.requests, args.login_requests)
+                DB_LATENCY.seconds = args.db_latency_ms / 1000
+                results = await runner.run(selected)
+                if args.db_stall_ms > 0:
+                    db_stall = await run_db_stall(runner, server, args.db_stall_ms)
+        target = "in-process"
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "git_revision": git_revision(),
+        "target": target,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+        "cold_start": cold_start,
+        "db_stall": db_stall,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,33 @@
-import React, { useState, useEffect, createContext, useContext } from "react";
+import React, { useState, useEffect, useRef, createContext, useContext } from "react";
 import "./App.css";
 import axios from "axios";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Access tokens are short-lived; concurrent 401s share a single refresh call
+let refreshRequest = null;
+
+const refreshAccessToken = () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    return Promise.reject(new Error('No refresh token'));
+  }
+  if (!refreshRequest) {
+    refreshRequest = axios
+      .post(`${API}/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        localStorage.setItem('token', response.data.access_token);
+        localStorage.setItem('refreshToken', response.data.refresh_token);
+        return response.data;
+      })
+      .finally(() => {
+        refreshRequest = null;
+      });
+  }
+  return refreshRequest;
+};
+
 // Auth Context
 const AuthContext = createContext();
 
@@ -21,6 +44,27 @@ const AuthProvider = ({ children }) => {
   const [token, setToken] = useState(localStorage.getItem('token'));
   const [loading, setLoading] = useState(true);
 
+  useEffect(() => {
+    // Renew an expired access token once and replay the request that failed
+    const interceptor = axios.interceptors.response.use(null, async (error) => {
+      const request = error.config;
+      const isAuthCall = request && /\/(login|refresh)$/.test(request.url);
+      if (error.response?.status !== 401 || !request || request._retried || isAuthCall) {
+        return Promise.reject(error);
+      }
+      request._retried = true;
+      try {
+        const data = await refreshAccessToken();
+        setToken(data.access_token);
+        request.headers.Authorization = `Bearer ${data.access_token}`;
+        return axios(request);
+      } catch (refreshError) {
+        return Promise.reject(error);
+      }
+    });
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   useEffect(() => {
     if (token) {
       checkAuth();
@@ -37,6 +81,7 @@ const AuthProvider = ({ children }) => {
       setUser(response.data);
     } catch (error) {
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
       setToken(null);
       setUser(null);
     } finally {
@@ -47,9 +92,10 @@ const AuthProvider = ({ children }) => {
   const login = async (username, password) => {
     try {
       const response = await axios.post(`${API}/login`, { username, password });
-      const { access_token, user: userData } = response.data;
+      const { access_token, refresh_token, user: userData } = response.data;
       
       localStorage.setItem('token', access_token);
+      localStorage.setItem('refreshToken', refresh_token);
       setToken(access_token);
       setUser(userData);
       return { success: true };
@@ -62,7 +108,14 @@ const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    if (token) {
+      // Revoke the token server-side; the local session is cleared regardless
+      axios.post(`${API}/logout`, {}, {
+        headers: { Authorization: `Bearer ${token}` }
+      }).catch(() => {});
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     setToken(null);
     setUser(null);
   };
@@ -185,6 +238,20 @@ const Login = () => {
   );
 };
 
+// Last health probe result reported by the backend
+const StatusBadge = ({ status }) => {
+  if (!status || status === 'unknown') {
+    return null;
+  }
+  const up = status === 'up';
+  return (
+    <div className={`flex items-center ${up ? 'text-green-600' : 'text-red-600'}`}>
+      <div className={`w-2 h-2 rounded-full mr-2 ${up ? 'bg-green-500' : 'bg-red-500'}`}></div>
+      {up ? 'En ligne' : 'Hors ligne'}
+    </div>
+  );
+};
+
 // Dashboard Component
 const Dashboard = () => {
   const [applications, setApplications] = useState([]);
@@ -195,12 +262,122 @@ const Dashboard = () => {
     fetchApplications();
   }, []);
 
+  // Live catalog and status updates; the stream is reopened with a fresh ticket
+  // whenever it ends, and the catalog is reloaded since events may have been missed
+  useEffect(() => {
+    let source = null;
+    let reconnectTimer = null;
+    let closed = false;
+    let connected = false;
+
+    const applyCatalogChanges = ({ changed, removed }) => {
+      setApplications(apps => {
+        const changedById = Object.fromEntries(changed.map(app => [app.id, app]));
+        const updated = apps
+          .filter(app => !removed.includes(app.id))
+          .map(app => changedById[app.id] || app);
+        const added = changed.filter(app => !apps.some(existing => existing.id === app.id));
+        return [...updated, ...added];
+      });
+    };
+
+    const applyStatuses = ({ statuses }) => {
+      setApplications(apps => apps.map(app => (
+        app.id in statuses ? { ...app, status: statuses[app.id] } : app
+      )));
+    };
+
+    const connect = async () => {
+      try {
+        const response = await axios.post(
+          `${API}/events/ticket`,
+          {},
+          { headers: { Authorization: `Bearer ${token}` } }
+        );
+        if (closed) {
+          return;
+        }
+        if (connected) {
+          fetchApplications();
+        }
+        connected = true;
+        source = new EventSource(`${API}/events/stream?ticket=${encodeURIComponent(response.data.ticket)}`);
+        source.addEventListener('catalog', event => applyCatalogChanges(JSON.parse(event.data)));
+        source.addEventListener('status', event => applyStatuses(JSON.parse(event.data)));
+        source.addEventListener('resync', () => fetchApplications());
+        source.onerror = () => {
+          source.close();
+          scheduleReconnect();
+        };
+      } catch (error) {
+        scheduleReconnect();
+      }
+    };
+
+    const scheduleReconnect = () => {
+      if (!closed) {
+        reconnectTimer = setTimeout(connect, 5000);
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      if (source) {
+        source.close();
+      }
+    };
+  }, [token]);
+
+  // Portal app tokens fetched in one batch, keyed by app id
+  const appTokens = useRef({});
+
+  const storeAppToken = (appToken) => {
+    appTokens.current[appToken.app_id] = {
+      accessToken: appToken.access_token,
+      expiresAt: Date.now() + appToken.expires_in * 1000
+    };
+    return appToken.access_token;
+  };
+
+  const prefetchAppTokens = async (apps) => {
+    const appIds = apps.filter(app => app.category === 'portal').map(app => app.id);
+    if (appIds.length === 0) {
+      return;
+    }
+    try {
+      const response = await axios.post(
+        `${API}/applications/access-tokens`,
+        { app_ids: appIds },
+        { headers: { Authorization: `Bearer ${token}` } }
+      );
+      response.data.tokens.forEach(storeAppToken);
+    } catch (error) {
+      console.error('Error prefetching access tokens:', error);
+    }
+  };
+
+  const getAppToken = async (app) => {
+    const cached = appTokens.current[app.id];
+    if (cached && cached.expiresAt - Date.now() > 30000) {
+      return cached.accessToken;
+    }
+    const response = await axios.post(
+      `${API}/applications/${app.id}/access-token`,
+      {},
+      { headers: { Authorization: `Bearer ${token}` } }
+    );
+    return storeAppToken(response.data);
+  };
+
   const fetchApplications = async () => {
     try {
       const response = await axios.get(`${API}/applications`, {
         headers: { Authorization: `Bearer ${token}` }
       });
       setApplications(response.data);
+      prefetchAppTokens(response.data);
     } catch (error) {
       console.error('Error fetching applications:', error);
     } finally {
@@ -217,14 +394,10 @@ const Dashboard = () => {
     } else {
       // For portal apps, generate token
       try {
-        const response = await axios.post(
-          `${API}/applications/${app.id}/access-token`,
-          {},
-          { headers: { Authorization: `Bearer ${token}` } }
-        );
-        console.log('Generated token for', app.name, ':', response.data.access_token);
+        const accessToken = await getAppToken(app);
+        console.log('Generated token for', app.name, ':', accessToken);
         // In a real implementation, you would redirect with this token
-        alert(`Token généré pour ${app.name}: ${response.data.access_token}`);
+        alert(`Token généré pour ${app.name}: ${accessToken}`);
       } catch (error) {
         console.error('Error generating token:', error);
       }
@@ -307,9 +480,12 @@ const Dashboard = () => {
                   </div>
                   <h3 className="text-lg font-semibold text-gray-800 mb-2">{app.name}</h3>
                   <p className="text-gray-600 text-sm mb-4">{app.description}</p>
-                  <div className="flex items-center text-xs text-blue-600 font-medium">
-                    <div className="w-2 h-2 bg-blue-500 rounded-full mr-2"></div>
-                    Accès Direct
+                  <div className="flex items-center justify-between text-xs font-medium">
+                    <div className="flex items-center text-blue-600">
+                      <div className="w-2 h-2 bg-blue-500 rounded-full mr-2"></div>
+                      Accès Direct
+                    </div>
+                    <StatusBadge status={app.status} />
                   </div>
                 </div>
               </div>
@@ -336,9 +512,12 @@ const Dashboard = () => {
                   </div>
                   <h3 className="text-lg font-semibold text-gray-800 mb-2">{app.name}</h3>
                   <p className="text-gray-600 text-sm mb-4">{app.description}</p>
-                  <div className="flex items-center text-xs text-purple-600 font-medium">
-                    <div className="w-2 h-2 bg-purple-500 rounded-full mr-2"></div>
-                    Token Requis
+                  <div className="flex items-center justify-between text-xs font-medium">
+                    <div className="flex items-center text-purple-600">
+                      <div className="w-2 h-2 bg-purple-500 rounded-full mr-2"></div>
+                      Token Requis
+                    </div>
+                    <StatusBadge status={app.status} />
                   </div>
                 </div>
               </div>
@@ -0,0 +1,75 @@
+"""
+Shared fixtures: the backend app running in-process against mongomock-motor
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "portal_tests")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("HEALTH_PROBE_ENABLED", "false")
+os.environ.setdefault("PROFILING_ENABLED", "true")
+# mongomock cannot create capped collections
+os.environ.setdefault("AUDIT_COLLECTION_SIZE_BYTES", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+import server  # noqa: E402
+from backend_bench import DatabaseLatency  # noqa: E402
+
+server.create_mongo_client = lambda: AsyncMongoMockClient()
+
+PASSWORD = "password123"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    """HTTP client for the app, after its startup warmup has finished"""
+    async with server.app.router.lifespan_context(server.app):
+        await server.startup.wait(10)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://portal") as http_client:
+            yield http_client
+
+
+async def register_and_login(client, username: str) -> dict:
+    """Create a user (if needed) and return its login response body"""
+    await client.post("/api/register", json={
+        "username": username,
+        "email": f"{username}@synclogic.com",
+        "full_name": username.title(),
+        "password": PASSWORD,
+    })
+    response = await client.post("/api/login", json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return response.json()
+
+
+def bearer(login: dict) -> dict:
+    return {"Authorization": f"Bearer {login['access_token']}"}
+
+
+@pytest.fixture
+def admin_username(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_USERNAMES", {"root"})
+    return "root"
+
+
+@pytest.fixture
+def db_latency(monkeypatch):
+    """Delay added to every awaited collection and cursor call while the fixture is active"""
+    latency = DatabaseLatency()
+    latency.install(monkeypatch.setattr)
+    return latency
@@ -0,0 +1,86 @@
+import pytest
+
+import server
+from server import encode_cursor
+from tests.conftest import PASSWORD, bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_update_user_invalidates_cached_profile(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    alice = bearer(await register_and_login(client, "alice"))
+    assert (await client.get("/api/me", headers=alice)).json()["full_name"] == "Alice"
+
+    response = await client.patch("/api/admin/users/alice", json={"full_name": "Alice Liddell"}, headers=admin)
+    assert response.status_code == 200
+    assert response.json()["full_name"] == "Alice Liddell"
+    assert (await client.get("/api/me", headers=alice)).json()["full_name"] == "Alice Liddell"
+
+
+async def test_deactivate_user_locks_out_existing_tokens(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    bob = bearer(await register_and_login(client, "bob"))
+    assert (await client.get("/api/me", headers=bob)).status_code == 200
+
+    response = await client.patch("/api/admin/users/bob", json={"is_active": False}, headers=admin)
+    assert response.status_code == 200
+    assert response.json()["is_active"] is False
+    assert (await client.get("/api/me", headers=bob)).status_code == 401
+
+    response = await client.patch("/api/admin/users/bob", json={"is_active": True}, headers=admin)
+    assert response.json()["is_active"] is True
+    assert (await client.post("/api/login", json={"username": "bob", "password": "password123"})).status_code == 200
+
+
+async def test_update_user_requires_admin(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    carol = bearer(await register_and_login(client, "carol"))
+    assert (await client.patch("/api/admin/users/carol", json={"full_name": "X"}, headers=carol)).status_code == 403
+    assert (await client.patch("/api/admin/users/nobody", json={"full_name": "X"}, headers=admin)).status_code == 404
+
+
+async def test_deactivated_user_cannot_log_in(client, admin_username, monkeypatch):
+    admin = bearer(await register_and_login(client, admin_username))
+    await register_and_login(client, "sybil")
+    await client.patch("/api/admin/users/sybil", json={"is_active": False}, headers=admin)
+
+    events = []
+    monkeypatch.setattr(server.audit_log, "record", lambda event, **fields: events.append((event, fields)))
+    sessions_before = await server.db.sessions.count_documents({"username": "sybil"})
+    response = await client.post("/api/login", json={"username": "sybil", "password": PASSWORD})
+    assert response.status_code == 401
+    assert await server.db.sessions.count_documents({"username": "sybil"}) == sessions_before
+    assert [fields["outcome"] for event, fields in events if event == "login"] == ["inactive"]
+
+
+async def test_user_listing_pages_through_every_match(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    for i in range(5):
+        await register_and_login(client, f"lister{i}")
+    # Two users created in the same instant are ordered by id
+    tied = await server.db.users.find_one({"username": "lister1"})
+    await server.db.users.update_one({"username": "lister2"}, {"$set": {"created_at": tied["created_at"]}})
+    docs = await server.db.users.find({"username": {"$regex": "^lister"}}).to_list(None)
+    expected = [doc["username"] for doc in sorted(docs, key=lambda d: (d["created_at"], d["id"]), reverse=True)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"username": "lister", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/admin/users", params=params, headers=admin)
+        assert response.status_code == 200
+        assert all("hashed_password" not in user for user in response.json())
+        seen += [user["username"] for user in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+async def test_user_listing_rejects_bad_cursors(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    for cursor in ("not-a-cursor!", encode_cursor("yesterday", "some-id"), encode_cursor("2024-01-01")):
+        response = await client.get("/api/admin/users", params={"cursor": cursor}, headers=admin)
+        assert response.status_code == 400
@@ -0,0 +1,71 @@
+import pytest
+
+from server import encode_cursor
+from tests.conftest import bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+NEW_APPLICATION = {
+    "name": "Grafana",
+    "description": "Tableaux de bord",
+    "icon": "📈",
+    "category": "portal",
+    "url": "https://grafana.example.com",
+}
+
+
+async def test_admin_writes_update_the_catalog(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    dave = bearer(await register_and_login(client, "dave"))
+
+    response = await client.put("/api/admin/applications/grafana", json=NEW_APPLICATION, headers=admin)
+    assert response.status_code == 200
+    assert response.json()["id"] == "grafana"
+    assert (await client.put("/api/admin/groups/all-users/applications/grafana", headers=admin)).status_code == 204
+    names = {application["id"]: application["name"] for application in (await client.get("/api/applications", headers=dave)).json()}
+    assert names["grafana"] == "Grafana"
+
+    renamed = {**NEW_APPLICATION, "name": "Grafana Cloud"}
+    assert (await client.put("/api/admin/applications/grafana", json=renamed, headers=admin)).status_code == 200
+    names = {application["id"]: application["name"] for application in (await client.get("/api/applications", headers=dave)).json()}
+    assert names["grafana"] == "Grafana Cloud"
+
+    assert (await client.delete("/api/admin/applications/grafana", headers=admin)).status_code == 204
+    ids = [application["id"] for application in (await client.get("/api/applications", headers=dave)).json()]
+    assert "grafana" not in ids
+    assert (await client.delete("/api/admin/applications/grafana", headers=admin)).status_code == 404
+
+
+async def test_application_writes_require_admin(client, admin_username):
+    erin = bearer(await register_and_login(client, "erin"))
+    assert (await client.put("/api/admin/applications/x", json=NEW_APPLICATION, headers=erin)).status_code == 403
+    assert (await client.delete("/api/admin/applications/app1", headers=erin)).status_code == 403
+
+
+async def test_cursor_pagination_walks_the_whole_catalog(client):
+    uri = bearer(await register_and_login(client, "uri"))
+    catalog = (await client.get("/api/applications", headers=uri)).json()
+    expected = [application["id"] for application in sorted(catalog, key=lambda a: (a["name"], a["id"]))]
+    assert len(expected) > 2
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "fields": "id,name"}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/applications", params=params, headers=uri)
+        assert response.status_code == 200
+        page = response.json()
+        assert all(set(application) == {"id", "name"} for application in page)
+        seen += [application["id"] for application in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+async def test_bad_application_cursors_are_rejected(client):
+    vera = bearer(await register_and_login(client, "vera"))
+    for cursor in ("not-a-cursor!", encode_cursor("only-one"), "W10"):
+        response = await client.get("/api/applications", params={"limit": 2, "cursor": cursor}, headers=vera)
+        assert response.status_code == 400
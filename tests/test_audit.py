@@ -0,0 +1,85 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from bson import ObjectId, json_util
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def make_audit_log(spill_dir) -> server.AuditLog:
+    return server.AuditLog(100, 10, 0.01, 0.2, str(spill_dir))
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+async def test_orphaned_spills_wait_for_the_database_bootstrap(client, tmp_path):
+    event_id = ObjectId()
+    (tmp_path / f"audit-{dead_pid()}.ndjson").write_text(json_util.dumps({"_id": event_id, "event": "login"}) + "\n")
+    bootstrapped = asyncio.Event()
+    audit_log = make_audit_log(tmp_path)
+    audit_log.start(bootstrapped)
+    try:
+        await asyncio.sleep(0.05)
+        assert await server.db.audit_events.count_documents({"_id": event_id}) == 0
+
+        bootstrapped.set()
+        for _ in range(100):
+            if await server.db.audit_events.count_documents({"_id": event_id}):
+                break
+            await asyncio.sleep(0.01)
+        assert await server.db.audit_events.count_documents({"_id": event_id}) == 1
+        assert not list(tmp_path.iterdir())
+    finally:
+        await audit_log.stop()
+
+
+async def test_stop_before_bootstrap_spills_the_queue(client, tmp_path):
+    audit_log = make_audit_log(tmp_path)
+    audit_log.start(asyncio.Event())
+    audit_log.record("login", username="oscar")
+    await audit_log.stop()
+    assert audit_log.stats()["spilled"] == 1
+    assert await server.db.audit_events.count_documents({"username": "oscar"}) == 0
+    assert "oscar" in Path(audit_log.spill_path).read_text()
+
+
+async def wait_for(predicate):
+    for _ in range(200):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+async def test_timed_out_writes_spill_and_replay_once(client, tmp_path, db_latency):
+    audit_log = make_audit_log(tmp_path)
+    bootstrapped = asyncio.Event()
+    bootstrapped.set()
+    audit_log.start(bootstrapped)
+    try:
+        db_latency.seconds = 0.5
+        audit_log.record("login", username="peter", outcome="first")
+        audit_log.record("login", username="peter", outcome="second")
+        await wait_for(lambda: audit_log.stats()["spilled"] == 2)
+        spilled = [json_util.loads(line) for line in Path(audit_log.spill_path).read_text().splitlines()]
+        assert [doc["outcome"] for doc in spilled] == ["first", "second"]
+        db_latency.seconds = 0
+
+        # The first batch landed even though its write timed out
+        await server.db.audit_events.insert_one(spilled[0])
+        audit_log.record("login", username="peter", outcome="third")
+        await wait_for(lambda: not any(tmp_path.iterdir()))
+        docs = await server.db.audit_events.find({"username": "peter"}).to_list(None)
+        assert sorted(doc["outcome"] for doc in docs) == ["first", "second", "third"]
+        assert len({doc["_id"] for doc in docs}) == 3
+    finally:
+        await audit_log.stop()
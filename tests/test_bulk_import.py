@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from tests.conftest import PASSWORD, bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+def errors_by_row(report: dict) -> dict:
+    return {error["row"]: error for error in report["errors"]}
+
+
+async def test_csv_import_reports_bad_rows_and_keeps_going(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    await register_and_login(client, "uma")
+    body = "\n".join([
+        "username,email,full_name,password",
+        f"victor,victor@synclogic.com,Victor,{PASSWORD}",
+        f"uma,uma2@synclogic.com,Uma,{PASSWORD}",
+        "walter,walter@synclogic.com",
+        f"xena,xena@synclogic.com,Xena,{PASSWORD}",
+    ])
+    response = await client.post(
+        "/api/admin/users/import", content=body, headers={**admin, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["total"], report["inserted"], report["failed"]) == (4, 2, 2)
+    errors = errors_by_row(report)
+    assert errors[2]["error"] == "Username already registered"
+    assert errors[3]["username"] == "walter"
+    assert "full_name" in errors[3]["error"]
+
+    login = await client.post("/api/login", json={"username": "xena", "password": PASSWORD})
+    assert login.status_code == 200
+
+
+async def test_ndjson_import_reports_bad_rows_and_keeps_going(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    lines = [
+        json.dumps({"username": "yusuf", "email": "yusuf@synclogic.com", "full_name": "Yusuf", "password": PASSWORD}),
+        "{not json",
+        json.dumps(["zoe"]),
+        json.dumps({"username": "yusuf", "email": "y2@synclogic.com", "full_name": "Yusuf", "password": PASSWORD}),
+        json.dumps({"username": "zara", "email": "zara@synclogic.com", "full_name": "Zara", "password": PASSWORD}),
+    ]
+    response = await client.post(
+        "/api/admin/users/import?format=ndjson", content="\n".join(lines), headers=admin
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["total"], report["inserted"], report["failed"]) == (5, 2, 3)
+    errors = errors_by_row(report)
+    assert errors[2]["error"].startswith("Invalid JSON")
+    assert errors[3]["error"] == "Expected a JSON object"
+    assert errors[4] == {"row": 4, "username": "yusuf", "error": "Username already registered"}
+
+
+async def test_import_rejects_unknown_format(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    response = await client.post("/api/admin/users/import?format=xml", content="<users/>", headers=admin)
+    assert response.status_code == 400
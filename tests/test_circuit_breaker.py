@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from pymongo.errors import AutoReconnect, DuplicateKeyError, ServerSelectionTimeoutError
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def failing(exc):
+    async def operation():
+        raise exc
+    return operation
+
+
+async def succeeding():
+    return "ok"
+
+
+async def test_request_errors_do_not_open_the_breaker():
+    breaker = server.CircuitBreaker(failure_threshold=2, reset_timeout=60, timeout=1)
+    for _ in range(5):
+        with pytest.raises(DuplicateKeyError):
+            await breaker.call(failing(DuplicateKeyError("E11000 duplicate key")))
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+
+
+async def test_connection_failures_and_timeouts_open_the_breaker():
+    breaker = server.CircuitBreaker(failure_threshold=3, reset_timeout=60, timeout=0.01)
+    with pytest.raises(server.DatabaseUnavailable):
+        await breaker.call(failing(AutoReconnect("connection reset")))
+    with pytest.raises(server.DatabaseUnavailable):
+        await breaker.call(failing(ServerSelectionTimeoutError("no servers")))
+    assert breaker.state == "closed"
+    with pytest.raises(server.DatabaseUnavailable):
+        await breaker.call(lambda: asyncio.sleep(1))
+    assert breaker.state == "open"
+    assert breaker.timeouts == 1
+
+    # Open: rejected without running the operation
+    calls = []
+    with pytest.raises(server.DatabaseUnavailable) as error:
+        await breaker.call(lambda: calls.append(1) or succeeding())
+    assert calls == []
+    assert error.value.status_code == 503
+    assert breaker.rejected == 1
+
+
+async def test_half_open_allows_one_trial():
+    breaker = server.CircuitBreaker(failure_threshold=1, reset_timeout=0.05, timeout=0.5)
+    with pytest.raises(server.DatabaseUnavailable):
+        await breaker.call(failing(AutoReconnect("down")))
+    await asyncio.sleep(0.06)
+
+    # A failed trial reopens at once
+    with pytest.raises(server.DatabaseUnavailable):
+        await breaker.call(failing(AutoReconnect("still down")))
+    assert breaker.state == "open"
+    await asyncio.sleep(0.06)
+
+    # Only one trial is in flight; concurrent calls are rejected until it succeeds
+    release = asyncio.Event()
+
+    async def slow_success():
+        await release.wait()
+        return "ok"
+
+    trial = asyncio.ensure_future(breaker.call(slow_success))
+    await asyncio.sleep(0)
+    assert breaker.state == "half_open"
+    with pytest.raises(server.DatabaseUnavailable):
+        await breaker.call(succeeding)
+    release.set()
+    assert await trial == "ok"
+    assert breaker.state == "closed"
+    assert await breaker.call(succeeding) == "ok"
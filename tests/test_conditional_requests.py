@@ -0,0 +1,48 @@
+import pytest
+
+from tests.conftest import bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+async def assert_revalidates(client, url: str, headers: dict, params=None) -> str:
+    response = await client.get(url, params=params, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "private" in response.headers["Cache-Control"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"stale", {etag}'):
+        response = await client.get(url, params=params, headers={**headers, "If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+    return etag
+
+
+async def test_catalog_revalidates_until_it_changes(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    wanda = bearer(await register_and_login(client, "wanda"))
+    etag = await assert_revalidates(client, "/api/applications", wanda)
+    await assert_revalidates(client, "/api/applications", wanda, params={"limit": 2, "fields": "id"})
+
+    wiki = {"name": "Wiki", "description": "Notes", "icon": "📘", "category": "portal", "url": "https://wiki.example.com"}
+    await client.put("/api/admin/applications/wanda-wiki", json=wiki, headers=admin)
+    await client.put("/api/admin/users/wanda/applications/wanda-wiki", headers=admin)
+    try:
+        response = await client.get("/api/applications", headers={**wanda, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert "wanda-wiki" in [application["id"] for application in response.json()]
+    finally:
+        await client.delete("/api/admin/applications/wanda-wiki", headers=admin)
+
+async def test_profile_revalidates_until_it_changes(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    xavier = bearer(await register_and_login(client, "xavier"))
+    etag = await assert_revalidates(client, "/api/me", xavier)
+
+    await client.patch("/api/admin/users/xavier", json={"full_name": "Xavier Renamed"}, headers=admin)
+    response = await client.get("/api/me", headers={**xavier, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["full_name"] == "Xavier Renamed"
@@ -0,0 +1,103 @@
+"""
+Behaviour while Mongo stalls, using the mongomock-motor stand-in with injected latency
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import server
+from tests.conftest import PASSWORD, bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = server.CircuitBreaker(failure_threshold=2, reset_timeout=0.3, timeout=0.05)
+    monkeypatch.setattr(server, "db_breaker", breaker)
+    return breaker
+
+
+def expire_fresh_caches():
+    server.user_cache.clear()
+    server.entitlement_index.users.clear()
+    server.entitlement_index.groups.clear()
+
+
+def fallbacks(cache: str, result: str) -> float:
+    return server.stale_fallback_total._values.get((cache, result), 0.0)
+
+
+async def test_stall_opens_breaker_and_serves_known_users(client, breaker, db_latency):
+    olivia = bearer(await register_and_login(client, "olivia"))
+    assert (await client.get("/api/applications", headers=olivia)).status_code == 200
+    hits = fallbacks("user", "hit")
+
+    db_latency.seconds = 1
+    expire_fresh_caches()
+    for _ in range(2):
+        started = time.perf_counter()
+        assert (await client.get("/api/me", headers=olivia)).status_code == 200
+        assert time.perf_counter() - started < 0.5
+    assert breaker.state == "open"
+    assert fallbacks("user", "hit") == hits + 2
+
+    # Open: answered from the last-known-good caches without touching the database
+    started = time.perf_counter()
+    response = await client.get("/api/applications", headers=olivia)
+    assert response.status_code == 200
+    assert len(response.json()) > 0
+    assert time.perf_counter() - started < 0.05
+    assert breaker.rejected > 0
+
+
+async def test_unknown_user_misses_the_fallback(client, breaker, db_latency):
+    peggy = bearer(await register_and_login(client, "peggy"))
+    misses = fallbacks("user", "miss")
+    db_latency.seconds = 1
+    expire_fresh_caches()
+    server.last_known_users.pop("peggy")
+    response = await client.get("/api/me", headers=peggy)
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    assert fallbacks("user", "miss") == misses + 1
+
+
+async def test_login_fails_fast_while_open(client, breaker, db_latency):
+    await register_and_login(client, "quentin")
+    db_latency.seconds = 1
+    for _ in range(2):
+        response = await client.post("/api/login", json={"username": "quentin", "password": PASSWORD})
+        assert response.status_code == 503
+    assert breaker.state == "open"
+
+    started = time.perf_counter()
+    response = await client.post("/api/login", json={"username": "quentin", "password": PASSWORD})
+    assert response.status_code == 503
+    assert time.perf_counter() - started < 0.05
+    response = await client.post("/api/register", json={
+        "username": "rupert", "email": "rupert@synclogic.com", "full_name": "Rupert", "password": PASSWORD,
+    })
+    assert response.status_code == 503
+
+
+async def test_half_open_trial_closes_breaker_after_recovery(client, breaker, db_latency):
+    ruth = await register_and_login(client, "ruth")
+    db_latency.seconds = 1
+    for _ in range(2):
+        assert (await client.post("/api/refresh", json={"refresh_token": ruth["refresh_token"]})).status_code == 503
+    assert breaker.state == "open"
+
+    # Still stalled when the reset timeout passes: the single trial fails and reopens
+    await asyncio.sleep(0.35)
+    assert (await client.post("/api/logout", headers=bearer(ruth))).status_code == 503
+    assert breaker.state == "open"
+
+    db_latency.seconds = 0
+    await asyncio.sleep(0.35)
+    response = await client.post("/api/refresh", json={"refresh_token": ruth["refresh_token"]})
+    assert response.status_code == 200
+    assert breaker.state == "closed"
+    assert breaker.opened == 2
@@ -0,0 +1,83 @@
+import pytest
+from mongomock_motor import AsyncMongoMockCollection
+
+import server
+from tests.conftest import bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+def make_user(name: str, groups=()) -> server.User:
+    return server.User(username=name, email=f"{name}@x", full_name=name, hashed_password="x", groups=list(groups))
+
+
+def test_generations_stay_bounded_and_stamps_keep_changing():
+    index = server.EntitlementIndex(8, 60, 60)
+    laura = make_user("laura", ["eng"])
+    for i in range(100):
+        index.invalidate("user", f"someone-{i}")
+        assert len(index._generations) <= 8
+
+    stamp = index._stamp(laura)
+    index.invalidate("group", "eng")
+    assert index._stamp(laura) != stamp
+
+    # Once eng is forgotten its stamp may only move forward, never back to an old value
+    stamp = index._stamp(laura)
+    for i in range(100):
+        index.invalidate("user", f"other-{i}")
+    assert ("group", "eng") not in index._generations
+    assert index._stamp(laura)[2] >= stamp[2]
+    assert index._stamp(laura) != stamp
+
+
+async def test_group_grant_reaches_members(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    mallory = bearer(await register_and_login(client, "mallory"))
+    assert (await client.delete("/api/admin/groups/all-users/applications/app8", headers=admin)).status_code == 204
+    ids = {application["id"] for application in (await client.get("/api/applications", headers=mallory)).json()}
+    assert "app8" not in ids
+
+    assert (await client.put("/api/admin/groups/ops/applications/app8", headers=admin)).status_code == 204
+    assert (await client.put("/api/admin/groups/ops/members/mallory", headers=admin)).status_code == 204
+    ids = {application["id"] for application in (await client.get("/api/applications", headers=mallory)).json()}
+    assert "app8" in ids
+    assert (await client.put("/api/admin/groups/all-users/applications/app8", headers=admin)).status_code == 204
+
+
+async def test_revoking_every_grant_survives_a_restart(client):
+    grants = await server.db.entitlements.find({}).to_list(None)
+    assert await server.db.catalog_meta.find_one({"_id": "entitlements_seeded"})
+    try:
+        await server.db.entitlements.delete_many({})
+        await server.seed_entitlements()
+        assert await server.db.entitlements.count_documents({}) == 0
+    finally:
+        if grants:
+            await server.db.entitlements.insert_many(grants)
+
+
+async def test_cold_user_reads_all_group_grants_in_one_query(client, monkeypatch):
+    await server.db.entitlements.insert_many([
+        {"principal_type": "group", "principal_id": f"team-{i}", "app_id": f"team-app-{i}"} for i in range(0, 200, 2)
+    ])
+    olga = make_user("olga", [f"team-{i}" for i in range(200)])
+    queries = []
+    find = AsyncMongoMockCollection.find
+
+    def counting_find(self, *args, **kwargs):
+        if self.name == "entitlements":
+            queries.append(args[0])
+        return find(self, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "find", counting_find)
+    try:
+        app_ids = await server.entitlement_index.app_ids(olga)
+        assert {f"team-app-{i}" for i in range(0, 200, 2)} <= app_ids
+        assert len(queries) == 2
+        # Groups without grants are cached too, so a second member needs no group query
+        queries.clear()
+        await server.entitlement_index.app_ids(make_user("pablo", [f"team-{i}" for i in range(200)]))
+        assert [query["principal_type"] for query in queries] == ["user"]
+    finally:
+        await server.db.entitlements.delete_many({"principal_id": {"$regex": "^team-"}})
@@ -0,0 +1,43 @@
+import pytest
+
+import server
+from tests.conftest import bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+async def open_stream(client, username: str):
+    login = bearer(await register_and_login(client, username))
+    ticket = (await client.post("/api/events/ticket", headers=login)).json()["ticket"]
+    return await client.get("/api/events/stream", params={"ticket": ticket})
+
+
+def failing_after(monkeypatch, calls: int):
+    """Let the first ``calls`` entitlement lookups through, then fail as if Mongo were down."""
+    app_ids = server.entitlement_index.app_ids
+    remaining = [calls]
+
+    async def flaky_app_ids(user):
+        if remaining[0] <= 0:
+            raise server.DatabaseUnavailable()
+        remaining[0] -= 1
+        return await app_ids(user)
+
+    monkeypatch.setattr(server.entitlement_index, "app_ids", flaky_app_ids)
+
+
+async def test_stream_is_refused_while_entitlements_are_unavailable(client, monkeypatch):
+    await register_and_login(client, "yara")
+    failing_after(monkeypatch, 0)
+    response = await open_stream(client, "yara")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+async def test_outage_after_headers_ends_the_stream_cleanly(client, monkeypatch):
+    monkeypatch.setattr(server, "SSE_MAX_STREAM_SECONDS", 5)
+    failing_after(monkeypatch, 1)
+    response = await open_stream(client, "zack")
+    assert response.status_code == 200
+    assert response.text == "retry: 5000\n\n"
+    assert not server.event_broadcaster._subscriptions
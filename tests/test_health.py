@@ -0,0 +1,39 @@
+import pytest
+from mongomock_motor import AsyncMongoMockCollection
+from pymongo.errors import OperationFailure
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_readiness_reports_index_builds(client):
+    response = await client.get("/health/ready")
+    assert response.status_code == 200
+    indexes = response.json()["indexes"]
+    assert indexes["users.username_1"]["ready"] is True
+    assert "build_ms" in indexes["users.username_1"]
+    assert all(status["ready"] for status in indexes.values())
+
+
+async def test_index_builds_are_exported(client):
+    body = (await client.get("/metrics")).text
+    assert 'portal_index_ready{index="users.username_1"} 1' in body
+
+
+async def test_missing_unique_index_blocks_startup(client, monkeypatch):
+    create_index = AsyncMongoMockCollection.create_index
+
+    async def failing_create_index(self, keys, **options):
+        if self.name == "users" and keys == "username":
+            raise OperationFailure("E11000 duplicate key error")
+        return await create_index(self, keys, **options)
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "create_index", failing_create_index)
+    with pytest.raises(RuntimeError, match="users.username_1"):
+        await server.ensure_indexes()
+    assert server.index_status["users.username_1"]["ready"] is False
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "create_index", create_index)
+    await server.ensure_indexes()
+    assert server.index_status["users.username_1"]["ready"] is True
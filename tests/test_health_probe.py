@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def handle(reader, writer):
+    """Stub application: /ok answers 200, /fail 500 and /hang never answers"""
+    request_line = await reader.readline()
+    while (await reader.readline()) not in (b"\r\n", b""):
+        pass
+    path = request_line.split()[1].decode()
+    if path == "/hang":
+        await asyncio.sleep(3600)
+    status = "200 OK" if path == "/ok" else "500 Internal Server Error"
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    writer.close()
+
+
+@pytest.fixture
+async def stub_url():
+    stub = await asyncio.start_server(handle, "127.0.0.1", 0)
+    host, port = stub.sockets[0].getsockname()[:2]
+    yield f"http://{host}:{port}"
+    stub.close()
+
+
+async def test_probe_all_reports_up_and_down(stub_url, monkeypatch):
+    applications = [
+        server.Application(id=app_id, name=app_id, description="", icon="", category="native", url=f"{stub_url}/{path}")
+        for app_id, path in (("healthy", "ok"), ("broken", "fail"), ("stuck", "hang"))
+    ]
+    monkeypatch.setattr(server.application_catalog, "applications", applications)
+    published = []
+    monkeypatch.setattr(server.event_broadcaster, "publish", lambda channel, payload: published.append(payload))
+
+    prober = server.HealthProber(interval=3600, jitter=0, timeout=0.5, concurrency=5)
+    prober.start()
+    try:
+        started = time.perf_counter()
+        while prober.version == 0:
+            assert time.perf_counter() - started < 2, "probe round did not finish within its timeout"
+            await asyncio.sleep(0.01)
+        assert prober.statuses == {"healthy": "up", "broken": "down", "stuck": "down"}
+        assert prober.version == 1
+        assert published == [{"statuses": {"healthy": "up", "broken": "down", "stuck": "down"}}]
+
+        # An unchanged round does not bump the version
+        started = time.perf_counter()
+        await prober.probe_all()
+        assert time.perf_counter() - started < 1
+        assert prober.version == 1
+    finally:
+        await prober.stop()
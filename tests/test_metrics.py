@@ -0,0 +1,24 @@
+import threading
+
+import server
+
+
+def test_histogram_counts_stay_consistent_across_threads():
+    histogram = server.Histogram("test_latency_seconds", "test", ("op",))
+    counter = server.Counter("test_events_total", "test", ("op",))
+
+    def work():
+        for i in range(20000):
+            histogram.observe((i % 7) / 1000, "find")
+            counter.inc("find")
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lines = list(histogram.render())
+    assert f'test_latency_seconds_count{{op="find"}} {8 * 20000}' in lines
+    assert f'test_latency_seconds_bucket{{op="find",le="+Inf"}} {8 * 20000}' in lines
+    assert f'test_events_total{{op="find"}} {8 * 20000.0}' in list(counter.render())
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import server
+from tests.conftest import PASSWORD, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+def test_needs_rehash_only_upgrades():
+    policy = server.PasswordHashingPolicy(rounds=6, target_ms=None, min_rounds=4, max_rounds=14)
+    assert policy.needs_rehash(server.hash_password("secret", 5))
+    assert not policy.needs_rehash(server.hash_password("secret", 6))
+    assert not policy.needs_rehash(server.hash_password("secret", 7))
+    assert policy.needs_rehash("not-a-bcrypt-hash")
+
+
+async def stored_cost(username: str) -> int:
+    user = await server.db.users.find_one({"username": username})
+    return server.bcrypt_cost(user["hashed_password"])
+
+
+async def test_login_upgrades_weaker_hash(client, monkeypatch):
+    await register_and_login(client, "frank")
+    assert await stored_cost("frank") == 4
+    monkeypatch.setattr(server.hashing_policy, "rounds", 5)
+    await client.post("/api/login", json={"username": "frank", "password": PASSWORD})
+    await asyncio.gather(*server.background_tasks)
+    assert await stored_cost("frank") == 5
+
+
+async def test_login_keeps_stronger_hash(client, monkeypatch):
+    monkeypatch.setattr(server.hashing_policy, "rounds", 6)
+    await register_and_login(client, "grace")
+    assert await stored_cost("grace") == 6
+    monkeypatch.setattr(server.hashing_policy, "rounds", 4)
+    await client.post("/api/login", json={"username": "grace", "password": PASSWORD})
+    await asyncio.gather(*server.background_tasks)
+    assert await stored_cost("grace") == 6
+
+
+async def test_process_pool_uses_spawned_workers():
+    pool = server.PasswordPool("process", 1, 1)
+    try:
+        hashed = await pool.run(server.hash_password, "secret", 4)
+        assert await pool.run(server.verify_password, "secret", hashed)
+        assert pool._get_executor()._mp_context.get_start_method() == "spawn"
+    finally:
+        pool.shutdown()
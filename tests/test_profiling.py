@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+import server
+from tests.conftest import bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+def sample_every(monkeypatch, interval: float):
+    sampler = server.StackSampler
+    monkeypatch.setattr(
+        server, "StackSampler",
+        lambda thread_id, _interval, max_seconds: sampler(thread_id, interval, max_seconds),
+    )
+
+
+async def test_admin_gets_collapsed_stacks(client, admin_username, db_latency, monkeypatch):
+    admin = bearer(await register_and_login(client, admin_username))
+    sample_every(monkeypatch, 0.001)
+    db_latency.seconds = 0.05
+    response = await client.get("/api/admin/users?limit=1", headers={**admin, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["x-profile-status"] == "200"
+    samples = int(response.headers["x-profile-samples"])
+    assert samples > 0
+    assert samples == sum(int(line.rsplit(" ", 1)[1]) for line in response.text.splitlines())
+
+
+async def test_unsampled_request_returns_original_response(client, admin_username, monkeypatch):
+    admin = bearer(await register_and_login(client, admin_username))
+    sample_every(monkeypatch, 60)
+    response = await client.get("/api/me?profile=1", headers=admin)
+    assert response.status_code == 200
+    assert response.headers["x-profile-samples"] == "0"
+    assert response.json()["username"] == admin_username
+
+
+async def test_flag_is_ignored_for_other_users(client, admin_username):
+    nina = bearer(await register_and_login(client, "nina"))
+    response = await client.get("/api/me?profile=1", headers=nina)
+    assert response.json()["username"] == "nina"
+    assert "x-profile-samples" not in response.headers
+
+
+def test_watchdog_logs_blocking_stack(caplog):
+    import asyncio
+
+    async def block_the_loop():
+        watchdog = server.EventLoopWatchdog(0.05)
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        time.sleep(0.3)
+        await asyncio.sleep(0.05)
+        watchdog.stop()
+        return watchdog.stalls
+
+    assert asyncio.run(block_the_loop()) == 1
+    assert "block_the_loop" in caplog.text
@@ -0,0 +1,41 @@
+import pytest
+from mongomock_motor import AsyncMongoMockCollection
+
+import server
+from state_backends import MemoryRateLimitBackend
+from tests.conftest import PASSWORD, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_limited_logins_are_rejected_before_any_lookup(client, monkeypatch):
+    await register_and_login(client, "trent")
+    monkeypatch.setattr(server, "LOGIN_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(server, "LOGIN_USER_BURST", 2)
+    monkeypatch.setattr(server, "LOGIN_USER_REFILL_PER_MINUTE", 1)
+    monkeypatch.setattr(server, "login_rate_limiter", server.LoginRateLimiter(MemoryRateLimitBackend(100)))
+
+    lookups, verifications = [], []
+    find_one, run = AsyncMongoMockCollection.find_one, server.password_pool.run
+
+    async def counting_find_one(self, *args, **kwargs):
+        if self.name == "users":
+            lookups.append(args)
+        return await find_one(self, *args, **kwargs)
+
+    async def counting_run(*args, **kwargs):
+        verifications.append(args)
+        return await run(*args, **kwargs)
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "find_one", counting_find_one)
+    monkeypatch.setattr(server.password_pool, "run", counting_run)
+
+    for _ in range(2):
+        response = await client.post("/api/login", json={"username": "trent", "password": "wrong"})
+        assert response.status_code == 401
+    assert len(lookups) == 2 and len(verifications) == 2
+
+    response = await client.post("/api/login", json={"username": "trent", "password": PASSWORD})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert len(lookups) == 2 and len(verifications) == 2
@@ -0,0 +1,31 @@
+import pytest
+
+from tests.conftest import PASSWORD, bearer, register_and_login
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_deactivation_revokes_tokens_and_sessions(client, admin_username):
+    admin = bearer(await register_and_login(client, admin_username))
+    judy = await register_and_login(client, "judy")
+    assert (await client.get("/api/me", headers=bearer(judy))).status_code == 200
+
+    assert (await client.patch("/api/admin/users/judy", json={"is_active": False}, headers=admin)).status_code == 200
+    assert (await client.get("/api/me", headers=bearer(judy))).status_code == 401
+    response = await client.post("/api/refresh", json={"refresh_token": judy["refresh_token"]})
+    assert response.status_code == 401
+
+    # Reactivation does not bring old sessions back, but a fresh login works at once
+    assert (await client.patch("/api/admin/users/judy", json={"is_active": True}, headers=admin)).status_code == 200
+    response = await client.post("/api/refresh", json={"refresh_token": judy["refresh_token"]})
+    assert response.status_code == 401
+    response = await client.post("/api/login", json={"username": "judy", "password": PASSWORD})
+    assert (await client.get("/api/me", headers=bearer(response.json()))).status_code == 200
+
+
+async def test_logout_revokes_session(client):
+    kim = await register_and_login(client, "kim")
+    assert (await client.post("/api/logout", headers=bearer(kim))).status_code == 204
+    assert (await client.get("/api/me", headers=bearer(kim))).status_code == 401
+    response = await client.post("/api/refresh", json={"refresh_token": kim["refresh_token"]})
+    assert response.status_code == 401
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import server
+import state_backends
+from state_backends import FileStateBackend
+
+pytestmark = pytest.mark.anyio
+
+
+def test_defaults_are_scoped_to_the_database():
+    assert server.SHARED_STATE_PATH.endswith("portal-shared-state-portal_tests.sqlite")
+    assert server.SHARED_STATE_KEY_PREFIX == "portal:portal_tests:"
+
+
+async def test_file_backend_forwards_events_and_shares_buckets(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    first, second = FileStateBackend(path, 0.01), FileStateBackend(path, 0.01)
+    received = []
+    second.subscribe("invalidate_user", received.append)
+    await first.start()
+    await second.start()
+    try:
+        first.publish("invalidate_user", {"username": "heidi"})
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        assert received == [{"username": "heidi"}]
+
+        first_bucket, second_bucket = first.rate_limit_backend(10), second.rate_limit_backend(10)
+        assert await first_bucket.take("login:user:heidi", 0.0, 1) == 0
+        assert await second_bucket.take("login:user:heidi", 0.0, 1) > 0
+    finally:
+        await first.stop()
+        await second.stop()
+
+
+
+async def test_starting_worker_replays_retained_revocations(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    first = FileStateBackend(path, 0.01)
+    await first.start()
+    try:
+        first.publish("revoke_token", {"jti": "abc", "exp": 0})
+        first.publish("invalidate_user", {"username": "ivan"})
+        await asyncio.gather(*state_backends._forwarding)
+    finally:
+        await first.stop()
+
+    late = FileStateBackend(path, 0.01)
+    revoked, invalidated = [], []
+    late.subscribe("revoke_token", revoked.append, retain_seconds=900)
+    late.subscribe("invalidate_user", invalidated.append)
+    await late.start()
+    try:
+        assert revoked == [{"jti": "abc", "exp": 0}]
+        assert invalidated == []
+        assert late.stats()["replayed"] == 1
+    finally:
+        await late.stop()
+
+
+async def test_file_buckets_are_bounded_and_counted(tmp_path):
+    state = FileStateBackend(str(tmp_path / "state.sqlite"), 0.01)
+    await state.start()
+    try:
+        buckets = state.rate_limit_backend(3)
+        assert await buckets.take("login:user:first", 0.0, 1) == 0
+        for i in range(4):
+            await buckets.take(f"login:user:sprayed-{i}", 0.0, 1)
+        assert buckets.stats() == {"keys": 3, "max_keys": 3, "evictions": 2}
+        # The oldest bucket was evicted, so it starts full again
+        assert await buckets.take("login:user:first", 0.0, 1) == 0
+    finally:
+        await state.stop()